@@ -18,13 +18,12 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import argparse
 import sys
 import os
 import logging
 import time
-import numpy as np
-from .utils import read_yaml_file
-from .tasks import GenerateDatasetTask, CompareFiltersTask
+from . import profiling, reporting
 
 
 def main():
@@ -32,7 +31,16 @@ def main():
     main function
     """
 
-    input_file = sys.argv[1]
+    parser = argparse.ArgumentParser(prog="python -m analysis", description="Runs the analysis of a case")
+    parser.add_argument("input_file", help="setup.yaml of the case, whose folder receives the outputs")
+    profiling.add_arguments(parser)
+    reporting.add_arguments(parser)
+    args = parser.parse_args()
+
+    # imported once the arguments are parsed, so --help does not load the tasks
+    from .runner import run_case  # pylint: disable=import-outside-toplevel
+
+    input_file = args.input_file
 
     if not os.path.exists(input_file):
         print("Input file does not exist")
@@ -56,12 +64,8 @@ def main():
     logging.info("Output: %s", output_path)
 
     try:
-        # freezes the ranfom seed
-        np.random.seed(1)
-
-        _, yml = read_yaml_file(input_file)
-        GenerateDatasetTask(yml, output_path, logging).perform()
-        CompareFiltersTask(yml, output_path, logging).perform()
+        with reporting.from_arguments(args, logging).activate():
+            run_case(input_file, logging, profiler=profiling.from_arguments(args))
 
         elapsed_time = time.time() - start_time
         logging.info("Task finished after %d seconds", elapsed_time)
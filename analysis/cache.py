@@ -0,0 +1,110 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import os
+from contextlib import contextmanager
+import numpy as np
+
+CACHE_PATH_VARIABLE = "ANALYSIS_CACHE_PATH"
+DEFAULT_CACHE_PATH = ".cache"
+DATASET_CACHE_SIZE_VARIABLE = "ANALYSIS_DATASET_CACHE_GB"
+DEFAULT_DATASET_CACHE_SIZE = 10.0
+
+
+def default_cache_path():
+    """ cache folder, taken from the environment when set """
+    return os.environ.get(CACHE_PATH_VARIABLE, DEFAULT_CACHE_PATH)
+
+
+def default_dataset_cache_size():
+    """ size bound of the dataset cache in bytes, taken from the environment in GB when set """
+    return int(float(os.environ.get(DATASET_CACHE_SIZE_VARIABLE, DEFAULT_DATASET_CACHE_SIZE)) * 2**30)
+
+
+@contextmanager
+def atomic_write(path):
+    """
+    yields a partial path next to path, renamed to path once the block
+    completes, so a reader never finds a partial file at path. The partial
+    file is removed when the block fails
+    """
+    partial_path = f"{path}.{os.getpid()}.part"
+    try:
+        yield partial_path
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+
+def content_hash(*parts):
+    """
+    hex digest of the given strings, numbers and arrays
+
+    arrays are hashed by dtype, shape and contents, so equal arrays always
+    give the same key
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            array = np.ascontiguousarray(part)
+            digest.update(f"{array.dtype.str}{array.shape}".encode())
+            digest.update(array.tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ArrayCache():
+    """ on-disk cache of arrays, one npy file per key """
+
+    def __init__(self, path=None, namespace=""):
+        self.path = os.path.join(path or default_cache_path(), namespace)
+
+    def key_path(self, key):
+        """ file holding the array of the given key """
+        return os.path.join(self.path, f"{key}.npy")
+
+    def load(self, key):
+        """ the cached array, or None when missing or unreadable """
+        try:
+            return np.load(self.key_path(key))
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, array):
+        """
+        caches the array under key, returning whether it could be stored,
+        as a cache that cannot be written only costs a recomputation
+
+        the file is written aside and renamed, so concurrent cases never
+        read a partial array
+        """
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with atomic_write(self.key_path(key)) as partial_path, open(partial_path, "wb") as stream:
+                np.save(stream, np.asarray(array))
+        except OSError:
+            return False
+        return True
@@ -1,4 +1,13 @@
-from .blue import Blue
-from .of2 import OF2
-from .mae import MAE
-from .wiener import Wiener
+from ..lazy import lazy_exports
+
+# exported names and the submodules defining them, imported on first access
+_EXPORTS = {
+    "Blue": ".blue",
+    "OF2": ".of2",
+    "MAE": ".mae",
+    "Wiener": ".wiener",
+    "Linear": ".linear",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
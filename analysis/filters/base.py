@@ -32,3 +32,10 @@ class FilterBase:  # pylint: disable=too-few-public-methods
     def apply(self, pulse):
         """abstract method for applying the filter over an input signal"""
         pass
+
+    def apply_batch(self, signals):
+        """applies the filter weights over each row of an (N, size) array"""
+        signals = np.asarray(signals)
+        if signals.shape[-1] != self.filter_size:
+            raise ValueError("Incompatible input size")
+        return signals @ self.weights[:self.filter_size]
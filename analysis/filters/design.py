@@ -0,0 +1,95 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import numpy as np
+from ..cache import content_hash
+from ..statistics import CovarianceAccumulator
+
+
+def shape_constraints(pulse_shape):
+    """
+    pulse shape g and its derivative dg at the digital samples
+    """
+    return pulse_shape.digital_template(0), pulse_shape.digital_template_derivative(0)
+
+
+def noise_covariance(noise, size):
+    """
+    covariance of the noise, given either as a dataset, as a covariance
+    accumulator or as a function returning one of them, or the identity
+    when there is no noise
+    """
+    if noise is None:
+        return np.identity(size)
+    if callable(noise):
+        noise = noise()
+    if not isinstance(noise, CovarianceAccumulator):
+        noise = CovarianceAccumulator.from_dataset(noise)
+    return noise.covariance()
+
+
+def constrained_weights(covariance, constraints, targets):
+    """
+    weights w minimizing w'Cw subject to Aw = targets
+
+    solves the lagrangian system [[C, -A'], [A, 0]] [w, l] = [0, targets]
+    """
+    size = covariance.shape[0]
+    n_constraints = constraints.shape[0]
+
+    mat_a = np.block([
+        [covariance, -constraints.T],
+        [constraints, np.zeros((n_constraints, n_constraints))],
+    ])
+    vec_b = np.concatenate([np.zeros(size), targets])
+
+    return np.linalg.solve(mat_a, vec_b)[:size]
+
+
+def design_weights(name, noise, constraints, targets, cache=None, noise_key=None):
+    """
+    constrained weights for the covariance of the noise, given as for
+    noise_covariance, read from the cache when already designed
+
+    the cache is keyed by noise_key, naming the noise, when given, so a
+    design already cached never estimates the covariance, and otherwise
+    by the covariance itself
+    """
+    constraints = np.asarray(constraints, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    size = constraints.shape[1]
+
+    covariance = None
+    if noise is None or noise_key is None:
+        covariance = np.asarray(noise_covariance(noise, size), dtype=float)
+
+    key = content_hash(name, noise_key if covariance is None else covariance, constraints, targets)
+    if cache is not None:
+        weights = cache.load(key)
+        if weights is not None:
+            return weights
+
+    if covariance is None:
+        covariance = np.asarray(noise_covariance(noise, size), dtype=float)
+    weights = constrained_weights(covariance, constraints, targets)
+    if cache is not None:
+        cache.store(key, weights)
+    return weights
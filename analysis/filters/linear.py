@@ -0,0 +1,53 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from textwrap import dedent
+import numpy as np
+from .base import FilterBase
+
+
+class Linear(FilterBase):
+    """ filter applying already designed weights, with an optional bias """
+
+    def __init__(self, weights, size=7):
+        super().__init__(size)
+        self.weights = np.asarray(weights, dtype=float)
+
+    def apply(self, pulse):
+        if pulse.size != self.filter_size:
+            raise ValueError("Incompatible input size")
+
+        return self.apply_batch(pulse[np.newaxis])[0]
+
+    def apply_batch(self, signals):
+        energies = super().apply_batch(signals)
+
+        # a weight beyond the filter size is the bias
+        if self.weights.size > self.filter_size:
+            energies = energies + self.weights[self.filter_size]
+        return energies
+
+    def __str__(self):
+        return dedent(f"""\
+          Linear Filter:
+            size = {self.filter_size}
+            weights = {", ".join("%.5f" % w for w in self.weights)}\
+        """)
@@ -23,6 +23,9 @@ from textwrap import dedent
 import numpy as np
 from .base import FilterBase
 
+# rows whose weights are gathered at once, bounding the gathered (rows, size, size) table
+GATHER_BLOCK_SIZE = 16384
+
 
 class MAE(FilterBase):
     """ MAE filter """
@@ -47,27 +50,39 @@ class MAE(FilterBase):
         self.centered_sample = 3
         self.threshold = threshold
 
+        # weights for each selection of the samples around the centered one,
+        # projected once on the first use
+        self.__side_samples = np.delete(np.arange(self.filter_size), self.centered_sample)
+        self.__weights_table = None
+
     def apply(self, pulse, ped=0.):
         if pulse.size != self.filter_size:
-            raise "Incompatible input size"
+            raise ValueError("Incompatible input size")
 
-        # substracts the pedestal from the input signal
-        no_ped_pulse = pulse - ped
+        return self.apply_batch(pulse[np.newaxis], ped)[0]
+
+    def apply_batch(self, signals, ped=0.):
+        """
+        applies the filter over each row of an (N, size) array, returning
+        the (N, size) matrix of estimated amplitudes
+        """
+        signals = np.asarray(signals)
+        if signals.shape[-1] != self.filter_size:
+            raise ValueError("Incompatible input size")
 
-        # projects the filter for each input
-        weights, selected_samples = self.project_filter_weights(
-            no_ped_pulse)
+        # substracts the pedestal from the input signal
+        no_ped_signals = signals - ped
 
-        # estimate amplitudes
-        vec_amplitudes = np.dot(no_ped_pulse.T, weights.T)
+        # selects the weights of each input
+        mask_indexes = self.__selection_mask_indexes(no_ped_signals)
+        weights_table = self.__get_weights_table()
 
-        # build output vector
-        j = 0
-        vec_output = np.zeros(self.filter_size)
-        for i in range(0, self.filter_size):
-            if selected_samples[i] == 1:
-                vec_output[i] = vec_amplitudes[j]
-                j = j + 1
+        # estimate amplitudes, gathering the weights of each input block by block
+        vec_output = np.zeros(no_ped_signals.shape)
+        for start in range(0, len(no_ped_signals), GATHER_BLOCK_SIZE):
+            end = start + GATHER_BLOCK_SIZE
+            weights = weights_table[mask_indexes[start:end]]
+            vec_output[start:end] = np.einsum("nij,nj->ni", weights, no_ped_signals[start:end])
 
         return vec_output
 
@@ -75,35 +90,44 @@ class MAE(FilterBase):
         """
         calculates the MAE weights
         """
+        mask_index = self.__selection_mask_indexes(pulse[np.newaxis])[0]
+        vec_selected_samples = self.__selected_samples(mask_index)
+        weights = self.__project_selection_weights(vec_selected_samples)
+        return weights, vec_selected_samples.astype(float)
 
-        # selects samples of interest
-        vec_selected_samples = np.zeros(self.filter_size)
-        vec_selected_samples[self.centered_sample] = 1
-        selected_samples_count = 1
-
-        vec_dm = np.dot(pulse.T, self.mat_h_inv)
-        for i in range(self.filter_size):
-            if i == self.centered_sample:
-                continue
-            if vec_dm[i] > self.threshold:
-                vec_selected_samples[i] = 1
-                selected_samples_count = selected_samples_count + 1
-
-        # projects the weights matrix
-        count = 0
-        target_amplitude_index = -1
-        mat_d = np.zeros((selected_samples_count, self.filter_size))
-        for i in range(self.filter_size):
-            if vec_selected_samples[i] == 1:
-                if i == self.centered_sample:
-                    target_amplitude_index = count
-                mat_d[count] = self.mat_h[i, :]
-                count = count + 1
-
+    def __selection_mask_indexes(self, signals):
+        """
+        encodes, as an integer, which samples around the centered one
+        are above the threshold after the deconvolution
+        """
+        vec_dm = signals @ self.mat_h_inv
+        above_threshold = vec_dm[:, self.__side_samples] > self.threshold
+        return above_threshold @ (1 << np.arange(self.__side_samples.size))
+
+    def __selected_samples(self, mask_index):
+        vec_selected_samples = np.zeros(self.filter_size, dtype=bool)
+        vec_selected_samples[self.centered_sample] = True
+        bits = (mask_index >> np.arange(self.__side_samples.size)) & 1
+        vec_selected_samples[self.__side_samples[bits == 1]] = True
+        return vec_selected_samples
+
+    def __project_selection_weights(self, vec_selected_samples):
+        mat_d = self.mat_h[vec_selected_samples]
         mat_aux = np.dot(mat_d, mat_d.T)
-        weights = np.linalg.solve(mat_aux, mat_d)
+        return np.linalg.solve(mat_aux, mat_d)
 
-        return weights, vec_selected_samples
+    def __get_weights_table(self):
+        """
+        projects, for each selection mask, the (size, size) matrix that maps
+        an input to the output vector, with zeroed rows for unselected samples
+        """
+        if self.__weights_table is None:
+            n_masks = 1 << self.__side_samples.size
+            self.__weights_table = np.zeros((n_masks, self.filter_size, self.filter_size))
+            for mask_index in range(n_masks):
+                vec_selected_samples = self.__selected_samples(mask_index)
+                self.__weights_table[mask_index][vec_selected_samples] = self.__project_selection_weights(vec_selected_samples)
+        return self.__weights_table
 
     def __str__(self):
         return dedent(f"""\
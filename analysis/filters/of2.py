@@ -22,72 +22,41 @@ limitations under the License.
 from textwrap import dedent
 import numpy as np
 from .base import FilterBase
+from .design import design_weights, shape_constraints
 
 
 class OF2(FilterBase):
     """ OF2 filter """
 
-    def __init__(self, noise_dataset=None):
-        super().__init__(7)
+    def __init__(self, pulse_shape, noise_dataset=None, weight_cache=None, noise_key=None):
+        super().__init__(len(pulse_shape.digital_samples_index))
+        self.pulse_shape = pulse_shape
         self.noise_dataset = noise_dataset
+        self.weight_cache = weight_cache
+        self.noise_key = noise_key
         self.project_filter_weights()
 
     def apply(self, pulse):
         if self.weights.size != pulse.size:
-            raise "Incompatible input size"
+            raise ValueError("Incompatible input size")
 
-        energy = 0.0
-        for i in range(self.filter_size):
-            energy = energy + (self.weights[i] * pulse[i])
-        return energy
+        return np.dot(self.weights, pulse)
 
     def project_filter_weights(self):
         """
-        calculates the OF2 weights using unitary covariance matrix
+        calculates the OF2 weights, with unit gain over the pulse shape and
+        insensitive to its phase and to the pedestal
         """
-        # pulse shape parameters
-        vec_g = np.array(
-            [0.0000, 0.0172, 0.4524, 1.0000, 0.5633, 0.1493, 0.0424])
-        vec_dg = np.array(
-            [0.00004019, 0.00333578, 0.03108120, 0.00000000, -0.02434490, -0.00800683, -0.00243344])
-
-        # unitary covariance matrix
-        mat_c = self.__get_noise_covariance_matrix()
-
-        # defines solution vector
-        vec_b = np.zeros(self.filter_size + 3)
-        vec_b[self.filter_size] = 1.0
-
-        # defines matrix A, where Aw=b
-        mat_a = np.zeros((self.filter_size + 3, self.filter_size + 3))
-
-        for i in range(self.filter_size):
-            # copies C to A
-            for j in range(self.filter_size):
-                mat_a[i][j] = mat_c[i][j]
-
-            # copies g to A
-            mat_a[self.filter_size][i] = vec_g[i]
-            mat_a[i][self.filter_size] = -vec_g[i]
-
-            # copies dg to A
-            mat_a[self.filter_size + 1][i] = vec_dg[i]
-            mat_a[i][self.filter_size + 1] = -vec_dg[i]
-
-            # sets the unitary column
-            mat_a[self.filter_size + 2][i] = 1.0
-            mat_a[i][self.filter_size + 2] = -1.0
-
-        vec_w = np.linalg.solve(mat_a, vec_b)
-
-        self.weights = np.zeros(self.filter_size)
-        for i in range(self.filter_size):
-            self.weights[i] = vec_w[i]
-
-    def __get_noise_covariance_matrix(self):
-        if self.noise_dataset is not None:
-            return np.cov(self.noise_dataset, rowvar=False)
-        return np.identity(self.filter_size)
+        vec_g, vec_dg = shape_constraints(self.pulse_shape)
+
+        self.weights = design_weights(
+            "of2",
+            self.noise_dataset,
+            np.array([vec_g, vec_dg, np.ones(self.filter_size)]),
+            np.array([1.0, 0.0, 0.0]),
+            self.weight_cache,
+            self.noise_key,
+        )
 
     def __str__(self):
         return dedent(f"""\
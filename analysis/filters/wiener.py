@@ -19,6 +19,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from itertools import chain
 from textwrap import dedent
 import numpy as np
 
@@ -28,74 +29,94 @@ from .base import FilterBase
 class Wiener(FilterBase):
     """ Wiener filter """
 
-    def __init__(self, train_dataset, pulse_generator, using_bias=True):
-        super().__init__(train_dataset.shape[1])
+    def __init__(self, train_dataset, pulse_generator, using_bias=True, chunk_size=100000):
+        """
+        the train dataset is either an (N, size) array, read in chunks of
+        chunk_size rows, or an iterable over such blocks, e.g. read from a
+        storage, which is then consumed once
+        """
+        blocks = self.__iter_blocks(train_dataset, chunk_size)
+        first_block = next(blocks, None)
+        if first_block is None:
+            raise ValueError("Empty train dataset")
+        super().__init__(first_block.shape[1])
         self.dataset = train_dataset
         self.pulse_generator = pulse_generator
         self.using_bias = using_bias
-        self.project_filter_weights()
+        self.chunk_size = chunk_size
+        self.project_filter_weights(chain([first_block], blocks))
 
     def apply(self, pulse):
         if self.weights.size < pulse.size:
-            raise "Incompatible input size"
+            raise ValueError("Incompatible input size")
 
-        energy = 0.0
-        for i in range(self.filter_size):
-            energy = energy + (self.weights[i] * pulse[i])
+        return self.apply_batch(pulse[np.newaxis])[0]
 
+    def apply_batch(self, signals):
+        energies = super().apply_batch(signals)
         if self.using_bias:
-            energy = energy + self.weights[-1]
+            energies = energies + self.weights[-1]
+        return energies
 
-        return energy
-
-    def project_filter_weights(self):
+    def project_filter_weights(self, blocks=None):
         """
         calculates the Wiener weights
+
+        the normal equations are accumulated over blocks of the train
+        dataset, so it does not need to fit in memory
         """
-        n_samples = self.dataset.shape[0]
+        if blocks is None:
+            blocks = self.__iter_blocks(self.dataset, self.chunk_size)
+        n_samples = 0
         n_cols = self.filter_size + 1 if self.using_bias else self.filter_size
 
-        vec_d = np.zeros(n_samples)
-        mat_x = np.zeros((n_samples, n_cols))
+        mat_r = np.zeros((n_cols, n_cols))
+        vec_p = np.zeros(n_cols)
 
-        # generate the matrix X and the vector d
-        # by summing known pulses to each noise row
-        for i, noise in enumerate(self.dataset):
+        for block in blocks:
+            noise = np.asarray(block)
+            n_samples += noise.shape[0]
+            mat_x, vec_d = self.__build_observations(noise)
 
-            # generate known pulse
-            analog_pulse = self.pulse_generator.generate_pulse()
-            digital_samples = analog_pulse.get_digital_samples()
-            amplitude = analog_pulse.amplitude
+            # cross-correlation of X and correlation between X and D
+            mat_r += mat_x.T @ mat_x
+            vec_p += mat_x.T @ vec_d
 
-            # sum the noise to the knows pulse
-            for j in range(self.filter_size):
-                mat_x[i][j] = noise[j] + digital_samples[j]
+        if n_samples == 0:
+            raise ValueError("Empty train dataset")
+        self.weights = np.linalg.solve(mat_r / n_samples, vec_p / n_samples)
+
+    @staticmethod
+    def __iter_blocks(train_dataset, chunk_size):
+        """
+        iterator over the blocks of the train dataset, sliced from it when
+        it is an array
+        """
+        if hasattr(train_dataset, "shape"):
+            return (train_dataset[start:start + chunk_size] for start in range(0, train_dataset.shape[0], chunk_size))
+        return iter(train_dataset)
 
-            # additional element
-            if self.using_bias:
-                mat_x[i][self.filter_size] = 1
+    def __build_observations(self, noise):
+        """
+        generates the matrix X and the vector d
+        by summing known pulses to each noise row
+        """
+        n_rows = noise.shape[0]
+        n_cols = self.filter_size + 1 if self.using_bias else self.filter_size
 
-            # desired amplitude
-            vec_d[i] = amplitude
+        # desired amplitude
+        vec_d = np.asarray(self.pulse_generator.random_amplitudes(n_rows), dtype=float)
 
-        # cross-correlation of X
-        mat_r = np.zeros((n_cols, n_cols))
-        for i in range(n_cols):
-            for j in range(n_cols):
-                summ = 0
-                for k in range(n_samples):
-                    summ = summ + (mat_x[k][i] * mat_x[k][j])
-                mat_r[i][j] = summ / n_samples
-
-        # correlation between X and D
-        vec_p = np.zeros(n_cols)
-        for i in range(n_cols):
-            summ = 0
-            for k in range(n_samples):
-                summ = summ + (mat_x[k][i] * vec_d[k])
-            vec_p[i] = summ / n_samples
+        mat_x = np.ones((n_rows, n_cols))
+        mat_x[:, :self.filter_size] = noise + self.__known_digital_samples(vec_d)
+        return mat_x, vec_d
 
-        self.weights = np.linalg.solve(mat_r, vec_p)
+    def __known_digital_samples(self, amplitudes):
+        """
+        digital samples of known pulses with the given amplitudes
+        """
+        _, _, samples = self.pulse_generator.generate_batch(amplitudes.size, amplitude=amplitudes)
+        return samples
 
     def __str__(self):
         return dedent(f"""\
@@ -1,4 +1,13 @@
-from .analog_pulse import AnalogPulse
-from .pulse_shape import PulseShape
-from .dataset_generator import DatasetGenerator
-from .pulse_generator import PulseGenerator
+from ..lazy import lazy_exports
+
+# exported names and the submodules defining them, imported on first access
+_EXPORTS = {
+    "AnalogPulse": ".analog_pulse",
+    "AnalogPulseBatch": ".analog_pulse",
+    "PulseShape": ".pulse_shape",
+    "DatasetGenerator": ".dataset_generator",
+    "PulseGenerator": ".pulse_generator",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -26,8 +26,9 @@ import numpy as np
 class AnalogPulse():
     """ Analog Pulse model """
 
-    def __init__(self, pulse_shape, amplitude=1.0, phase=0, noise_mean=0.0, noise_sigma=0.0, pedestal=0.0, deformation_level=0.0):
+    def __init__(self, pulse_shape, amplitude=1.0, phase=0, noise_mean=0.0, noise_sigma=0.0, pedestal=0.0, deformation_level=0.0, rng=None):
         self.pulse_shape = pulse_shape
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.amplitude = amplitude
         self.phase = phase
         self.noise_mean = noise_mean
@@ -35,6 +36,7 @@ class AnalogPulse():
         self.pedestal = pedestal
         self.deformation_level = deformation_level
         self.__i = 0
+        self.__waveform = None
 
     def get_sample(self, time_index):
         """
@@ -44,38 +46,70 @@ class AnalogPulse():
         if sample_index < 0 or sample_index >= self.pulse_shape.size:
             return 0
 
-        shape_sample = self.pulse_shape.shape[sample_index]
-        deformation = self.__random_deformation(shape_sample)
-        noise = self.__random_noise()
-        sample = self.amplitude * (shape_sample + deformation) + self.pedestal + noise
-        return sample
+        return self.__sample(self.pulse_shape.shape[sample_index])
 
     def get_digital_samples(self):
         """
         get the digital samples with phase deviation
         """
-        return [self.get_sample(time_index) for time_index in self.pulse_shape.digital_samples_index]
+        return self.digital_samples()
+
+    def digital_samples(self):
+        """
+        digital samples with phase deviation, as an array
+        """
+        return self.__as_batch().digital_samples()[0]
+
+    def waveform(self):
+        """
+        time and samples of the whole pulse, as arrays
+        """
+        return (self.pulse_shape.time, self.__as_batch().waveforms()[0])
+
+    @classmethod
+    def batch(cls, pulse_shape, amplitudes, phases, **kwargs):
+        """
+        create many pulses at once, sharing the shape and parameters
+        """
+        return AnalogPulseBatch(pulse_shape, amplitudes, phases, **kwargs)
 
     def __iter__(self):
         self.__i = 0
+        self.__waveform = self.waveform()
         return self
 
     def __next__(self):
         if self.__i < self.pulse_shape.size:
-            # sample
-            sample = self.get_sample(self.__i)
-
-            # time
-            time = self.pulse_shape.time[self.__i]
-
+            time, samples = self.__waveform
+            sample = (time[self.__i], samples[self.__i])
             self.__i += 1
 
-            return (time, sample)
+            return sample
 
         raise StopIteration
 
+    def __as_batch(self):
+        return AnalogPulseBatch(
+            self.pulse_shape,
+            [self.amplitude],
+            [self.phase],
+            noise_mean=self.noise_mean,
+            noise_sigma=self.noise_sigma,
+            pedestal=self.pedestal,
+            deformation_level=self.deformation_level,
+            rng=self.rng,
+        )
+
+    def __sample(self, shape_sample):
+        """
+        deformed, noisy sample of the pulse given the shape sample
+        """
+        deformation = self.__random_deformation(shape_sample)
+        noise = self.__random_noise()
+        return self.amplitude * (shape_sample + deformation) + self.pedestal + noise
+
     def __index_with_phase_deviation(self, time_index):
-        phase_index_offset = int(self.phase / self.pulse_shape.resolution)
+        phase_index_offset = int(self.pulse_shape.phase_index_offset(self.phase))
         index_with_phase_devitation = time_index - phase_index_offset
         return index_with_phase_devitation
 
@@ -87,7 +121,7 @@ class AnalogPulse():
             return 0
 
         sigma = self.deformation_level * abs(shape_sample)
-        return np.random.normal(0, sigma)
+        return self.rng.normal(0, sigma)
 
     def __random_noise(self):
         """
@@ -96,7 +130,7 @@ class AnalogPulse():
         if self.noise_mean == 0 and self.noise_sigma == 0:
             return 0
 
-        return np.random.normal(self.noise_mean, self.noise_sigma)
+        return self.rng.normal(self.noise_mean, self.noise_sigma)
 
     def __str__(self):
         return textwrap.dedent(f"""\
@@ -110,3 +144,93 @@ class AnalogPulse():
             resolution = {self.pulse_shape.resolution}
             size = {self.pulse_shape.size}\
         """)
+
+
+class AnalogPulseBatch():
+    """ Many analog pulses stored as arrays """
+
+    def __init__(self, pulse_shape, amplitudes, phases, noise_mean=0.0, noise_sigma=0.0, pedestal=0.0, deformation_level=0.0, rng=None):
+        self.pulse_shape = pulse_shape
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.amplitudes = np.asarray(amplitudes, dtype=float)
+        self.phases = np.asarray(phases)
+        self.noise_mean = noise_mean
+        self.noise_sigma = noise_sigma
+        self.pedestal = pedestal
+        self.deformation_level = deformation_level
+
+    def __len__(self):
+        return self.amplitudes.size
+
+    def __getitem__(self, index):
+        return AnalogPulse(
+            self.pulse_shape,
+            amplitude=self.amplitudes[index],
+            phase=self.phases[index],
+            noise_mean=self.noise_mean,
+            noise_sigma=self.noise_sigma,
+            pedestal=self.pedestal,
+            deformation_level=self.deformation_level,
+            rng=self.rng,
+        )
+
+    def digital_samples(self):
+        """
+        digital samples of every pulse, one row per pulse
+        """
+        shape_samples, _, in_shape = self.pulse_shape.digital_templates(self.phases)
+        return self.__samples(shape_samples, in_shape)
+
+    def waveforms(self):
+        """
+        samples of every pulse over the whole shape time, one row per pulse
+        """
+        size = self.pulse_shape.size
+        phase_index_offsets = self.pulse_shape.phase_index_offset(self.phases).reshape(-1, 1)
+        shape_indexes = np.arange(size) - phase_index_offsets
+        in_shape = (shape_indexes >= 0) & (shape_indexes < size)
+        shape_samples = np.where(in_shape, self.pulse_shape.shape[np.clip(shape_indexes, 0, size - 1)], 0.)
+        return self.__samples(shape_samples, in_shape)
+
+    def __samples(self, shape_samples, in_shape):
+        """
+        deformed, noisy samples given the shape samples, zero out of the shape
+        """
+        shape_samples = shape_samples[in_shape]
+        scale = np.broadcast_to(self.amplitudes[:, np.newaxis], in_shape.shape)[in_shape]
+        deformation = self.__random_deformation(shape_samples)
+        noise = self.__random_noise(shape_samples.size)
+
+        samples = np.zeros(in_shape.shape)
+        samples[in_shape] = scale * (shape_samples + deformation) + self.pedestal + noise
+        return samples
+
+    def __random_deformation(self, shape_samples):
+        """
+        generate a random deformation for each shape sample
+        """
+        if self.deformation_level == 0:
+            return 0
+
+        return self.rng.normal(0, self.deformation_level * np.abs(shape_samples))
+
+    def __random_noise(self, n_samples):
+        """
+        generate a random gaussian noise for each sample
+        """
+        if self.noise_mean == 0 and self.noise_sigma == 0:
+            return 0
+
+        return self.rng.normal(self.noise_mean, self.noise_sigma, n_samples)
+
+    def __str__(self):
+        return textwrap.dedent(f"""\
+          AnalogPulseBatch:
+            deformation_level = {self.deformation_level}
+            noise_mean = {self.noise_mean}
+            noise_sigma = {self.noise_sigma}
+            pedestal = {self.pedestal}
+            pulses = {len(self)}
+            resolution = {self.pulse_shape.resolution}
+            size = {self.pulse_shape.size}\
+        """)
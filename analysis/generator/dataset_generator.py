@@ -19,73 +19,299 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from collections import deque
 import numpy as np
-from progress.bar import Bar
+from ..profiling import profiled
+from ..reporting import progress
+from .analog_pulse import AnalogPulse
 
 
 class DatasetGenerator():
     """ Dataset generator """
 
-    def __init__(self, pulse_generator):
+    def __init__(self, pulse_generator, block_size=10000, chunk_size=100000, workers=1):
         """ Default constructor """
         self.pulse_generator = pulse_generator
         self.pulse_shape = pulse_generator.pulse_shape
 
-    def generate_samples(self, n_events, sampling_rate, occupancy=0):
+        # number of pile-up pulses deposited at once by the batched engine
+        self.block_size = block_size
+
+        # number of samples (or windows) per block of the streaming generation
+        self.chunk_size = chunk_size
+
+        # number of processes generating the shards
+        self.workers = workers
+
+    def generate_samples(self, n_events, sampling_rate, occupancy=0, seed_compatible=False):
         """
         generate samples
+
+        the occupancy flags, amplitudes, phases and deformations are drawn as
+        arrays and the pulses are deposited over the template in blocks.
+        With seed_compatible, the random numbers are drawn bunch by bunch in
+        the same order of the former implementation, so a pulse generator
+        with a RandomState rng gives the same samples as the legacy global
+        state seeded alike.
         """
-        samples = self.__random_noise(n_events) + self.pulse_generator.pedestal
+        samples = self.__random_noise(n_events, self.pulse_generator.rng) + self.pulse_generator.pedestal
         amplitudes = np.zeros(n_events)
         bunch_interval = int(sampling_rate / self.pulse_shape.resolution)
+        bunches = np.arange(0, n_events, bunch_interval)
+
+        if seed_compatible:
+            self.__generate_bunch_by_bunch(samples, amplitudes, bunches, occupancy)
+        else:
+            self.__generate_batched(samples, amplitudes, bunches, occupancy)
+
+        return (samples, amplitudes)
 
-        progress_bar = Bar('Generating dataset', max=int(n_events/bunch_interval), suffix='%(percent).1f%% - %(eta)ds')
+    def generate_digital_samples(self, n_samples, sampling_rate, occupancy=0):
+        """
+        generate samples only at the digitization instants
 
-        for i in range(0, n_events, bunch_interval):
-            signal_occurency_probability = np.random.uniform()
-            if signal_occurency_probability < occupancy:
-                pulse = self.pulse_generator.generate_pulse(pedestal=0, noise_mean=0, noise_sigma=0)
-                amplitudes[i] = pulse.amplitude
+        each sample is a bunch crossing, so the pile-up pulses are evaluated
+        just at the bunch lags they reach instead of over the whole fine grid
+        """
+        blocks = list(self.iter_digital_samples(n_samples, sampling_rate, occupancy))
+        if not blocks:
+            return (np.zeros(0), np.zeros(0))
+        samples = np.concatenate([block for block, _ in blocks])
+        amplitudes = np.concatenate([block for _, block in blocks])
+        return (samples, amplitudes)
 
-                for j, (_, pulse_sample) in enumerate(pulse):
-                    offset = j - self.pulse_shape.time_origin_index
+    def iter_digital_samples(self, n_samples, sampling_rate, occupancy=0, chunk_size=None, seed=None):
+        """
+        yield the digital samples and amplitudes in blocks of chunk_size
 
-                    # skip out of bound index
-                    if offset < 0 and i < (-1 * offset):
-                        continue
-                    if i >= (n_events - offset):
-                        continue
+        the bunches are split into shards of chunk_size samples, each one
+        drawn from its own Generator spawned from the seed, so the shards
+        can be generated by the workers in any order. A block is only
+        released when the following shard, whose pulses reach back into
+        it, has been summed. Pulse tails crossing a shard boundary are
+        carried over, always in shard order, so the output does not depend
+        on the number of workers.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        lags = self.pulse_shape.bunch_lags(sampling_rate)
+        if chunk_size < -lags[0]:
+            raise ValueError(f"chunk_size must be at least {-lags[0]} samples")
 
-                    samples[i + offset] += pulse_sample
-            progress_bar.next()
+        shard_starts = range(0, n_samples, chunk_size)
+        shard_seeds = self.__seed_sequence(seed).spawn(len(shard_starts))
+        shards = ((start, min(start + chunk_size, n_samples), n_samples, sampling_rate, occupancy, shard_seed)
+                  for start, shard_seed in zip(shard_starts, shard_seeds))
 
-        progress_bar.finish()
-        return (samples, amplitudes)
+        pending_samples = np.zeros(0)
+        pending_amplitudes = np.zeros(0)
+        emitted = 0
+
+        # finished on exhaustion or when the consumer closes the generator early
+        with progress("Generating dataset", n_samples, unit="samples") as generation:
+            for first, shard_samples, start, shard_amplitudes in self.__map_shards(shards):
+                end = start + shard_amplitudes.size
+
+                # buffer from the first sample not released yet up to the last one reached by this shard
+                buffer_size = first + shard_samples.size - emitted
+                samples = np.zeros(buffer_size)
+                samples[:pending_samples.size] = pending_samples
+                samples[first - emitted:] += shard_samples
+                amplitudes = np.zeros(buffer_size)
+                amplitudes[:pending_amplitudes.size] = pending_amplitudes
+                amplitudes[start - emitted:end - emitted] = shard_amplitudes
+                generation.advance(end - start)
+
+                # samples before the reach of the next shard are final
+                ready = n_samples - emitted if end == n_samples else end + lags[0] - emitted
+                released = 0
+                while ready - released >= chunk_size or (end == n_samples and released < ready):
+                    size = min(chunk_size, ready - released)
+                    yield (samples[released:released + size], amplitudes[released:released + size])
+                    released += size
+
+                pending_samples = samples[released:]
+                pending_amplitudes = amplitudes[released:]
+                emitted += released
+
+    def generate_shard(self, start, end, n_samples, sampling_rate, occupancy, seed):
+        """
+        generate the bunches from start to end of a dataset of n_samples
+
+        returns the index of the first sample reached by the shard, the
+        noise and pulses summed from there on, and the shard amplitudes
+        """
+        rng = np.random.Generator(np.random.PCG64(seed))
+        lags = self.pulse_shape.bunch_lags(sampling_rate)
+        first = max(start + lags[0], 0)
+        samples = np.zeros(min(end + lags[-1], n_samples) - first)
+
+        samples[start - first:end - first] += self.__random_noise(end - start, rng) + self.pulse_generator.pedestal
+
+        hits = np.flatnonzero(rng.uniform(size=end - start) < occupancy)
+        pulse_amplitudes = self.pulse_generator.random_amplitudes(hits.size, rng)
+        pulse_phases = self.pulse_generator.random_phases(hits.size, rng)
+
+        amplitudes = np.zeros(end - start)
+        amplitudes[hits] = pulse_amplitudes
+        self.__deposit_digital_pulses(samples, hits + (start - first), pulse_amplitudes, pulse_phases, sampling_rate, rng)
+
+        return (first, samples, start, amplitudes)
+
+    def __map_shards(self, shards):
+        """
+        generate the shards in order, on a pool of processes when there is
+        more than one worker, keeping a bounded number of them in flight
+        """
+        if self.workers <= 1:
+            for shard in shards:
+                yield self.generate_shard(*shard)
+            return
 
-    def generate_windowed_samples(self, window_size, sampling_rate, n_events, occupancy):
+        # imported here, workers and serial runs never need it
+        from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = deque()
+            for shard in shards:
+                in_flight.append(executor.submit(profiled(self.generate_shard), *shard))
+                if len(in_flight) >= 2 * self.workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def __seed_sequence(self, seed):
+        """
+        seed sequence the shards are spawned from, which draws its entropy
+        from the pulse generator rng when no seed is given
+        """
+        if isinstance(seed, np.random.SeedSequence):
+            return seed
+        if seed is None:
+            rng = self.pulse_generator.rng
+            # a legacy RandomState has randint in place of integers
+            draw = rng.integers if isinstance(rng, np.random.Generator) else rng.randint
+            seed = [int(word) for word in draw(0, 2**32, size=4, dtype=np.uint64)]
+        return np.random.SeedSequence(seed)
+
+    def iter_windowed_samples(self, window_size, sampling_rate, n_events, occupancy, chunk_size=None, seed=None):
+        """
+        yield segmented samples in blocks of chunk_size events
+        """
+        chunk_size = chunk_size or self.chunk_size
+        for samples, amplitudes in self.iter_digital_samples(window_size * n_events, sampling_rate, occupancy, window_size * chunk_size, seed):
+            yield (samples.reshape(-1, window_size), amplitudes.reshape(-1, window_size))
+
+    def generate_windowed_samples(self, window_size, sampling_rate, n_events, occupancy, fine_grid=False, seed_compatible=False):
         """
         generate segmented samples
+
+        by default only the digitization instants are generated. Set fine_grid
+        to synthesize the whole fine grid and sample it afterwards, which is
+        also the path taken when seed_compatible is set.
         """
-        time_resolution = self.pulse_shape.resolution
-        total_length = int((window_size * n_events * sampling_rate) / time_resolution)
+        if fine_grid or seed_compatible:
+            time_resolution = self.pulse_shape.resolution
+            total_length = int((window_size * n_events * sampling_rate) / time_resolution)
 
-        raw_samples, raw_amplitudes = self.generate_samples(total_length, sampling_rate, occupancy)
-        sampled_samples = self.__sample_list(raw_samples, time_resolution, sampling_rate)
-        sampled_amplitudes = self.__sample_list(raw_amplitudes, time_resolution, sampling_rate)
+            raw_samples, raw_amplitudes = self.generate_samples(total_length, sampling_rate, occupancy, seed_compatible)
+            sampled_samples = self.__sample_list(raw_samples, time_resolution, sampling_rate)
+            sampled_amplitudes = self.__sample_list(raw_amplitudes, time_resolution, sampling_rate)
+        else:
+            blocks = list(self.iter_windowed_samples(window_size, sampling_rate, n_events, occupancy))
+            if not blocks:
+                return (np.zeros((0, window_size)), np.zeros((0, window_size)))
+            return (np.concatenate([block for block, _ in blocks]), np.concatenate([block for _, block in blocks]))
 
         windowed_samples = np.array(np.split(sampled_samples, n_events))
         windowed_amplitudes = np.array(np.split(sampled_amplitudes, n_events))
 
         return (windowed_samples, windowed_amplitudes)
 
+    def __generate_batched(self, samples, amplitudes, bunches, occupancy):
+        """
+        draw all pile-up pulses at once and deposit them block by block
+        """
+        rng = self.pulse_generator.rng
+        hits = bunches[rng.uniform(size=bunches.size) < occupancy]
+        pulse_amplitudes = self.pulse_generator.random_amplitudes(hits.size)
+        pulse_phases = self.pulse_generator.random_phases(hits.size)
+        amplitudes[hits] = pulse_amplitudes
+
+        with progress("Generating dataset", hits.size, unit="pulses") as generation:
+            for start in range(0, hits.size, self.block_size):
+                end = start + self.block_size
+                self.__deposit_pulses(samples, hits[start:end], pulse_amplitudes[start:end], pulse_phases[start:end])
+                generation.advance(hits[start:end].size)
+
+    def __generate_bunch_by_bunch(self, samples, amplitudes, bunches, occupancy):
+        """
+        draw the pile-up pulses one bunch crossing at a time
+        """
+        with progress("Generating dataset", bunches.size, unit="bunches") as generation:
+            for i in bunches:
+                signal_occurency_probability = self.pulse_generator.rng.uniform()
+                if signal_occurency_probability < occupancy:
+                    pulse = self.pulse_generator.generate_pulse(pedestal=0, noise_mean=0, noise_sigma=0)
+                    amplitudes[i] = pulse.amplitude
+                    self.__deposit_pulses(samples, np.array([i]), np.array([pulse.amplitude]), np.array([pulse.phase]))
+                generation.advance()
+
+    def __deposit_pulses(self, samples, positions, pulse_amplitudes, pulse_phases):
+        """
+        sum deformed pulses, centered at the given positions, to the samples
+        """
+        pulses = AnalogPulse.batch(
+            self.pulse_shape,
+            pulse_amplitudes,
+            pulse_phases,
+            deformation_level=self.pulse_generator.deformation_level,
+            rng=self.pulse_generator.rng,
+        )
+        pulse_samples = pulses.waveforms()
+
+        # skip out of bound index
+        time_indexes = np.arange(self.pulse_shape.size)
+        sample_indexes = positions[:, np.newaxis] + time_indexes - self.pulse_shape.time_origin_index
+        in_bounds = (sample_indexes >= 0) & (sample_indexes < samples.size)
+        sample_indexes = sample_indexes[in_bounds]
+        if sample_indexes.size == 0:
+            return
+
+        first = sample_indexes.min()
+        deposit = np.bincount(sample_indexes - first, weights=pulse_samples[in_bounds])
+        samples[first:first + deposit.size] += deposit
+
+    def __deposit_digital_pulses(self, samples, bunches, pulse_amplitudes, pulse_phases, sampling_rate, rng):
+        """
+        sum deformed pulses, centered at the given bunches, to the digital samples
+        """
+        lags = self.pulse_shape.bunch_lags(sampling_rate)
+        shape_samples, _, _ = self.pulse_shape.bunch_templates(pulse_phases, sampling_rate)
+        pulse_samples = np.asarray(pulse_amplitudes)[:, np.newaxis] * (shape_samples + self.__random_deformation(shape_samples, rng))
+
+        # each bunch holds a single pulse, so the indexes of a lag never repeat
+        for k, lag in enumerate(lags):
+            sample_indexes = bunches + lag
+            in_bounds = (sample_indexes >= 0) & (sample_indexes < samples.size)
+            samples[sample_indexes[in_bounds]] += pulse_samples[in_bounds, k]
+
+    def __random_deformation(self, shape_samples, rng):
+        """
+        generate a random deformation for each shape sample
+        """
+        deformation_level = self.pulse_generator.deformation_level
+        if deformation_level == 0:
+            return 0
+
+        return rng.normal(0, deformation_level * np.abs(shape_samples))
+
     def __sample_list(self, raw_list, time_resolution, sampling_rate):
         interval = int(sampling_rate / time_resolution)
         return raw_list[0::interval]
 
-    def __random_noise(self, n_events):
+    def __random_noise(self, n_events, rng):
         """
         generate a random noise
         """
         mean = self.pulse_generator.noise_mean
         sigma = self.pulse_generator.noise_sigma
-        return np.random.normal(mean, sigma, n_events)
+        return rng.normal(mean, sigma, n_events)
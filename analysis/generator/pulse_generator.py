@@ -20,6 +20,7 @@ limitations under the License.
 """
 
 import textwrap
+from functools import partial
 import numpy as np
 from .analog_pulse import AnalogPulse
 
@@ -27,27 +28,28 @@ from .analog_pulse import AnalogPulse
 class PulseGenerator():
     """ Pulse generator """
 
-    def __init__(self, pulse_shape):
+    def __init__(self, pulse_shape, rng=None):
         """ Default constructor """
         self.pulse_shape = pulse_shape
+        self.rng = rng if rng is not None else np.random.default_rng()
 
         self.deformation_level = 0.0
         self.noise_mean = 0.0
         self.noise_sigma = 0.0
         self.pedestal = 0
 
-        # amplitude distribution
-        self.amplitude_generator = np.random.random_integers
+        # amplitude distribution, named after the rng method drawing it
+        self.amplitude_generator = "random_integers"
         self.amplitude_generator_args = (0, 1023)
 
         # phase distribution
-        self.phase_generator = np.random.random_integers
+        self.phase_generator = "random_integers"
         self.phase_generator_args = (0, 0)
 
     @classmethod
-    def from_yml(cls, yml, pulse_shape):
+    def from_yml(cls, yml, pulse_shape, rng=None):
         """ Constructor from YML """
-        instance = cls(pulse_shape)
+        instance = cls(pulse_shape, rng)
 
         if yml["deformation_level"]:
             instance.set_deformation_level(yml["deformation_level"])
@@ -57,8 +59,10 @@ class PulseGenerator():
             instance.set_noise_params(sigma=yml["noise_sigma"])
         if yml["pedestal"]:
             instance.set_pedestal(yml["pedestal"])
+        if yml.get("amplitude_generator"):
+            instance.set_amplitude_generator(yml["amplitude_generator"], tuple(yml["amplitude_params"]))
         if yml["phase_generator"]:
-            instance.set_phase_generator(random_function=getattr(np.random, yml["phase_generator"]))
+            instance.set_phase_generator(random_function=yml["phase_generator"])
         if yml["phase_params"]:
             instance.set_phase_generator(random_function_args=tuple(yml["phase_params"]))
 
@@ -69,31 +73,71 @@ class PulseGenerator():
         generate a random pulse
         """
         default_pulse_params = {
-            "amplitude": self.__random_amplitude(),
+            "amplitude": self.random_amplitudes(),
             "deformation_level": self.deformation_level,
             "noise_mean": self.noise_mean,
             "noise_sigma": self.noise_sigma,
             "pedestal": self.pedestal,
-            "phase": self.__random_phase(),
+            "phase": self.random_phases(),
         }
         merged_pulse_params = {**default_pulse_params, **kwargs}
-        return AnalogPulse(self.pulse_shape, **merged_pulse_params)
+        return AnalogPulse(self.pulse_shape, rng=self.rng, **merged_pulse_params)
 
-    def __random_amplitude(self):
+    def generate_batch(self, n_pulses, **kwargs):
         """
-        generate a random amplitude
+        generate many random pulses at once
+
+        returns the amplitudes, the phases and a matrix with the digital
+        samples of each pulse, all as contiguous float arrays
         """
-        return self.amplitude_generator(*self.amplitude_generator_args)
+        default_pulse_params = {
+            "amplitude": None,
+            "deformation_level": self.deformation_level,
+            "noise_mean": self.noise_mean,
+            "noise_sigma": self.noise_sigma,
+            "pedestal": self.pedestal,
+            "phase": None,
+        }
+        merged_pulse_params = {**default_pulse_params, **kwargs}
+        amplitudes = merged_pulse_params.pop("amplitude")
+        phases = merged_pulse_params.pop("phase")
+
+        if amplitudes is None:
+            amplitudes = self.random_amplitudes(n_pulses)
+        if phases is None:
+            phases = self.random_phases(n_pulses)
+        amplitudes = np.ascontiguousarray(np.broadcast_to(amplitudes, (n_pulses,)), dtype=float)
+        phases = np.ascontiguousarray(np.broadcast_to(phases, (n_pulses,)), dtype=float)
+
+        pulses = AnalogPulse.batch(self.pulse_shape, amplitudes, phases, rng=self.rng, **merged_pulse_params)
+        return amplitudes, phases, pulses.digital_samples()
 
-    def __random_phase(self):
+    def random_amplitudes(self, size=None, rng=None):
         """
-        generate a random phase
+        generate a random amplitude, or an array of them when size is given
         """
-        return self.phase_generator(*self.phase_generator_args)
+        return self.__distribution(self.amplitude_generator, rng)(*self.amplitude_generator_args, size=size)
+
+    def random_phases(self, size=None, rng=None):
+        """
+        generate a random phase, or an array of them when size is given
+        """
+        return self.__distribution(self.phase_generator, rng)(*self.phase_generator_args, size=size)
+
+    def __distribution(self, name, rng=None):
+        """
+        method of rng, or of the generator rng, drawing the named distribution.
+        The legacy random_integers, with an inclusive high bound, is kept for
+        the setup files
+        """
+        rng = rng if rng is not None else self.rng
+        if name == "random_integers" and isinstance(rng, np.random.Generator):
+            return partial(rng.integers, endpoint=True)
+        return getattr(rng, name)
 
     def set_amplitude_generator(self, random_function, random_function_args):
         """
-        set the random amplitude generator
+        set the random amplitude generator, given the name of the distribution
         """
         self.amplitude_generator = random_function
         self.amplitude_generator_args = random_function_args
@@ -119,9 +163,15 @@ class PulseGenerator():
         """
         self.pedestal = pedestal
 
+    def set_rng(self, rng):
+        """
+        set the random number generator
+        """
+        self.rng = rng
+
     def set_phase_generator(self, random_function=None, random_function_args=None):
         """
-        set the random phase generator
+        set the random phase generator, given the name of the distribution
         """
         if random_function is not None:
             self.phase_generator = random_function
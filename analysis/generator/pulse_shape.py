@@ -19,16 +19,47 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import os
 import textwrap
+from collections import OrderedDict
 import numpy as np
+from ..cache import ArrayCache, content_hash
+
+
+def load_shape_file(path):
+    """
+    time and shape columns of a pulse shape file
+
+    the parsed columns are cached under .cache/pulse_shapes, keyed by the
+    path, modification time and size of the file, so the many processes
+    reading the same template neither read nor parse it again
+    """
+    status = os.stat(path)
+    cache = ArrayCache(namespace="pulse_shapes")
+    key = content_hash(os.path.abspath(path), status.st_mtime_ns, status.st_size)
+    input_data = cache.load(key)
+    if input_data is None:
+        input_data = np.loadtxt(path)
+        try:
+            cache.store(key, input_data)
+        except OSError:
+            # read-only cache folder, the file is parsed every time
+            pass
+    return input_data
+
 
 class PulseShape():
     """ Pulse generator """
 
-    def __init__(self, shape_path, digital_samples_time = []):
+    def __init__(self, shape_path, digital_samples_time = [], cache_size=256):
         """ Default constructor """
         self.shape_path = shape_path
         self.digital_samples_time = digital_samples_time
+
+        # phase-shifted templates, evicting the least recently used
+        self.cache_size = cache_size
+        self.__template_cache = OrderedDict()
+
         self.read_pulse_shape()
 
     @classmethod
@@ -43,7 +74,7 @@ class PulseShape():
         """
         read pulse shape file
         """
-        input_data = np.loadtxt(self.shape_path)
+        input_data = load_shape_file(self.shape_path)
 
         # shape values
         self.shape = input_data[:, 1]
@@ -54,9 +85,103 @@ class PulseShape():
         self.time_origin_index = int(np.where(self.time == .0)[0][0])
         self.resolution = self.time[1] - self.time[0]
 
+        # time derivative of the shape
+        self.derivative = np.gradient(self.shape, self.time)
+
         # digital indexes
         self.digital_samples_index = np.in1d(self.time, self.digital_samples_time).nonzero()[0]
 
+        self.__template_cache.clear()
+
+    def phase_index_offset(self, phase):
+        """
+        shift, in shape samples, of a pulse with the given phase (or phases)
+        """
+        return (np.asarray(phase) / self.resolution).astype(int)
+
+    def bunch_lags(self, sampling_rate):
+        """
+        lags, in bunch crossings, reached by the pulse samples
+        relative to its own bunch
+        """
+        return self.__lags(int(sampling_rate / self.resolution))
+
+    def digital_template(self, phase=0):
+        """
+        digital samples g of the unitary pulse with the given phase
+        """
+        return self.__get_template(int(self.phase_index_offset(phase)), None)[0]
+
+    def digital_template_derivative(self, phase=0):
+        """
+        time derivative dg of the unitary pulse at the digital samples
+        """
+        return self.__get_template(int(self.phase_index_offset(phase)), None)[1]
+
+    def digital_templates(self, phases):
+        """
+        templates of an array of phases at the digital samples
+
+        returns g, dg and whether each sample falls within the shape,
+        as (n_phases, n_digital_samples) arrays
+        """
+        return self.__get_templates(phases, None)
+
+    def bunch_templates(self, phases, sampling_rate):
+        """
+        templates of an array of phases at the bunch lags given by bunch_lags
+
+        returns g, dg and whether each sample falls within the shape,
+        as (n_phases, n_lags) arrays
+        """
+        return self.__get_templates(phases, int(sampling_rate / self.resolution))
+
+    def __get_templates(self, phases, interval):
+        phase_index_offsets = self.phase_index_offset(phases).reshape(-1)
+        unique_offsets, template_indexes = np.unique(phase_index_offsets, return_inverse=True)
+        templates = [self.__get_template(int(offset), interval) for offset in unique_offsets]
+        template_indexes = template_indexes.reshape(-1)
+
+        if not templates:
+            n_samples = self.__template_time_indexes(interval).size
+            return tuple(np.zeros((0, n_samples), dtype=dtype) for dtype in (float, float, bool))
+        return tuple(np.array([template[k] for template in templates])[template_indexes] for k in range(3))
+
+    def __get_template(self, phase_index_offset, interval):
+        """
+        template shifted by phase_index_offset at the digital samples,
+        or at the bunch lags when the bunch interval is given
+        """
+        key = (phase_index_offset, interval)
+        if key in self.__template_cache:
+            self.__template_cache.move_to_end(key)
+            return self.__template_cache[key]
+
+        shape_indexes = self.__template_time_indexes(interval) - phase_index_offset
+        in_shape = (shape_indexes >= 0) & (shape_indexes < self.size)
+        shape_indexes = np.clip(shape_indexes, 0, self.size - 1)
+
+        template = (
+            np.where(in_shape, self.shape[shape_indexes], 0.),
+            np.where(in_shape, self.derivative[shape_indexes], 0.),
+            in_shape,
+        )
+        for array in template:
+            array.flags.writeable = False
+
+        self.__template_cache[key] = template
+        if len(self.__template_cache) > self.cache_size:
+            self.__template_cache.popitem(last=False)
+        return template
+
+    def __template_time_indexes(self, interval):
+        if interval is None:
+            return self.digital_samples_index
+        return self.__lags(interval) * interval + self.time_origin_index
+
+    def __lags(self, interval):
+        return np.arange(-(self.time_origin_index // interval), (self.size - 1 - self.time_origin_index) // interval + 1)
+
     def __str__(self):
         return textwrap.dedent(f"""\
           PulseShape:
@@ -0,0 +1,248 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import functools
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from .cache import atomic_write
+
+# recorder the module level spans are added to, set by Metrics.activate
+_ACTIVE = None
+
+
+def _peak_rss_mb(who):
+    """ high-water mark of the resident memory, kilobytes on linux and bytes on macos """
+    peak_rss = resource.getrusage(who).ru_maxrss
+    return peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10
+
+
+def _cpu_seconds():
+    """ cpu time of the process and of its finished workers """
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class Span():
+    """ measures of a named step, nested within the span it was opened in """
+
+    def __init__(self, name, parent=None, events=None):
+        self.name = name
+        self.path = f"{parent.path}/{name}" if parent is not None else name
+        self.parent = parent
+        self.events = events
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.children_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.rss_growth_mb = 0.0
+        self.workers_peak_rss_mb = 0.0
+
+    def add_events(self, events):
+        """ counts events processed within the span """
+        self.events = (self.events or 0) + events
+
+    def record(self, wall_seconds, cpu_seconds, start_peak_rss_mb):
+        """ adds a measured interval to the span """
+        self.wall_seconds += wall_seconds
+        self.cpu_seconds += cpu_seconds
+        self.peak_rss_mb = _peak_rss_mb(resource.RUSAGE_SELF)
+        self.rss_growth_mb += self.peak_rss_mb - start_peak_rss_mb
+        self.workers_peak_rss_mb = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+        if self.parent is not None:
+            self.parent.children_seconds += wall_seconds
+
+    def as_dict(self):
+        """ measures of the span, with the events rate when events were counted """
+        measures = {
+            "name": self.name,
+            "path": self.path,
+            "wall_seconds": self.wall_seconds,
+            "self_seconds": self.wall_seconds - self.children_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_mb": self.peak_rss_mb,
+            "rss_growth_mb": self.rss_growth_mb,
+            "workers_peak_rss_mb": self.workers_peak_rss_mb,
+        }
+        if self.events is not None:
+            measures["events"] = self.events
+            measures["events_per_second"] = self.events / self.wall_seconds if self.wall_seconds > 0 else None
+        return measures
+
+
+class Metrics():
+    """
+    spans recorded along a case run, reopening a span adds to it
+
+    each span measures its wall and cpu time, the cpu time including the
+    workers that finished within it, the high-water mark of the resident
+    memory at its end and how much it raised it, and the events per second
+    when events were counted. Spans opened within another one are nested,
+    and their parent also reports its time out of them as self_seconds.
+    The throughput of the tasks reporting their progress is recorded along
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.progress = []
+        self.started = time.time()
+        self.__stack = []
+        self.__spans_by_path = {}
+
+    @contextmanager
+    def activate(self):
+        """ makes the module level spans record into these metrics """
+        global _ACTIVE  # pylint: disable=global-statement
+        previous, _ACTIVE = _ACTIVE, self
+        try:
+            yield self
+        finally:
+            _ACTIVE = previous
+
+    @contextmanager
+    def span(self, name, events=None):
+        """ measures the enclosed block as a span """
+        span = self.__open(name, events)
+        self.__stack.append(span)
+        start_wall, start_cpu, start_peak = time.perf_counter(), _cpu_seconds(), _peak_rss_mb(resource.RUSAGE_SELF)
+        try:
+            yield span
+        finally:
+            self.__stack.pop()
+            span.record(time.perf_counter() - start_wall, _cpu_seconds() - start_cpu, start_peak)
+
+    def iterate(self, name, iterable, events=None):
+        """
+        yields the items of iterable, measuring as one span only the time
+        spent producing them. events, a function of an item, counts its events
+        """
+        span = self.__open(name, None)
+        iterator = iter(iterable)
+        while True:
+            start_wall, start_cpu, start_peak = time.perf_counter(), _cpu_seconds(), _peak_rss_mb(resource.RUSAGE_SELF)
+            self.__stack.append(span)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.__stack.pop()
+                span.record(time.perf_counter() - start_wall, _cpu_seconds() - start_cpu, start_peak)
+            if events is not None:
+                span.add_events(events(item))
+            yield item
+
+    def current(self):
+        """ innermost open span, None out of any span """
+        return self.__stack[-1] if self.__stack else None
+
+    def add_progress(self, label, path, unit, done, total, seconds):
+        """ records the throughput of a finished task, started within the span of the path """
+        self.progress.append({
+            "label": label,
+            "path": path,
+            "unit": unit,
+            "done": done,
+            "total": total,
+            "seconds": seconds,
+            "rate": done / seconds if seconds > 0 else None,
+        })
+
+    def as_dict(self):
+        return {
+            "started": self.started,
+            "wall_seconds": time.time() - self.started,
+            "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+            "spans": [span.as_dict() for span in self.spans],
+            "progress": self.progress,
+        }
+
+    def write(self, path, **extra):
+        """ writes the spans as json, through a partial file renamed when complete """
+        with atomic_write(path) as partial_path, open(partial_path, "w") as stream:
+            json.dump({**extra, **self.as_dict()}, stream, indent=2)
+
+    def __open(self, name, events):
+        """
+        span of the name within the current one, spans opened again, e.g.
+        once per chunk, add up
+        """
+        parent = self.current()
+        path = f"{parent.path}/{name}" if parent is not None else name
+        if path in self.__spans_by_path:
+            span = self.__spans_by_path[path]
+            if events is not None:
+                span.add_events(events)
+            return span
+
+        span = Span(name, parent, events)
+        self.spans.append(span)
+        self.__spans_by_path[path] = span
+        return span
+
+
+@contextmanager
+def span(name, events=None):
+    """ measures the enclosed block as a span of the active metrics, if any """
+    if _ACTIVE is None:
+        yield None
+        return
+    with _ACTIVE.span(name, events) as active_span:
+        yield active_span
+
+
+def iterate(name, iterable, events=None):
+    """ Metrics.iterate over the active metrics, or the plain iterable """
+    if _ACTIVE is None:
+        return iterable
+    return _ACTIVE.iterate(name, iterable, events)
+
+
+def add_events(events):
+    """ counts events within the innermost span of the active metrics """
+    if _ACTIVE is not None and _ACTIVE.current() is not None:
+        _ACTIVE.current().add_events(events)
+
+
+def current_path():
+    """ path of the innermost span of the active metrics, None out of any """
+    if _ACTIVE is None or _ACTIVE.current() is None:
+        return None
+    return _ACTIVE.current().path
+
+
+def record_progress(label, path, unit, done, total, seconds):
+    """ Metrics.add_progress of the active metrics, if any """
+    if _ACTIVE is not None:
+        _ACTIVE.add_progress(label, path, unit, done, total, seconds)
+
+
+def timed(name=None):
+    """ decorator measuring every call of a function as a span """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
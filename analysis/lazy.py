@@ -0,0 +1,42 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import importlib
+import sys
+
+
+def lazy_exports(package, exports):
+    """
+    module __getattr__ and __dir__ of a package importing each exported
+    name from the submodule defining it on first access, so importing a
+    single submodule, e.g. in a pool worker, does not import its siblings
+    """
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
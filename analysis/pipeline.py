@@ -0,0 +1,159 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import textwrap
+import zlib
+import numpy as np
+from .cache import atomic_write, content_hash
+from .instrumentation import span
+from .profiling import profile_stage
+
+# bumped whenever a stage changes the outputs it produces from the same inputs
+PIPELINE_VERSION = 1
+
+
+class Stage():
+    """ step of a pipeline, fingerprinted by its parameters and dependencies """
+
+    def __init__(self, name, action, parameters=None, depends=(), always=False, output_files=()):
+        self.name = name
+        self.action = action
+        self.parameters = parameters or {}
+        self.depends = tuple(depends)
+        self.always = always
+        self.output_files = tuple(output_files)
+        self.fingerprint = None
+
+
+class Pipeline():
+    """
+    small DAG of stages run in the order they were added
+
+    the outputs of a stage, a dict of arrays, are stored in the stages
+    folder along with its fingerprint, a hash of its parameters and of
+    the fingerprints of the stages it depends on. A stage whose stored
+    fingerprint still matches is not run again and its outputs are only
+    loaded when a stage depending on it runs. Each stage draws from its
+    own rng, derived from the seed sequence and its name, so skipping a
+    stage never shifts the random stream of another one
+    """
+
+    def __init__(self, output_path, logging, seed_sequence=None):
+        self.path = os.path.join(output_path, "stages")
+        self.logging = logging
+        self.seed_sequence = seed_sequence if seed_sequence is not None else np.random.SeedSequence()
+        self.stages = {}
+        self.__outputs = {}
+
+    def add(self, name, action, parameters=None, depends=(), always=False, output_files=()):
+        """
+        adds a stage, whose action is called with the outputs of its
+        dependencies, by name, and its rng. Stages marked as always are
+        run on every call, while stages writing files out of the stages
+        folder list them as output files, so they are run again when any is missing
+        """
+        for dependency in depends:
+            if dependency not in self.stages:
+                raise RuntimeError(f"Stage {name} depends on unknown stage {dependency}")
+
+        stage = Stage(name, action, parameters, depends, always, output_files)
+        stage.fingerprint = content_hash(json.dumps({
+            "version": PIPELINE_VERSION,
+            "name": name,
+            "parameters": stage.parameters,
+            "depends": {dependency: self.stages[dependency].fingerprint for dependency in depends},
+        }, sort_keys=True, separators=(",", ":"), default=str))
+
+        self.stages[name] = stage
+        return stage
+
+    def run(self):
+        """
+        runs every stage out of date, returning the names of those run
+        """
+        self.__outputs = {}
+        performed = []
+        for stage in self.stages.values():
+            if not self.is_up_to_date(stage.name):
+                self.__perform(stage)
+                performed.append(stage.name)
+            else:
+                self.logging.info(textwrap.dedent(f"""\
+                  Pipeline:
+                    Stage {stage.name} up to date. Skipping!"""))
+        return performed
+
+    def is_up_to_date(self, name):
+        """ whether run skips the stage, as its stored outputs still match """
+        stage = self.stages[name]
+        return not stage.always and self.__is_up_to_date(stage)
+
+    def rng(self, name):
+        """ rng of the stage, which does not depend on the other stages """
+        seed_sequence = np.random.SeedSequence(
+            self.seed_sequence.entropy,
+            spawn_key=tuple(self.seed_sequence.spawn_key) + (zlib.crc32(name.encode("utf-8")),),
+        )
+        return np.random.default_rng(seed_sequence)
+
+    def outputs(self, name):
+        """ outputs of a stage, loaded from the stages folder when not in memory """
+        if name not in self.__outputs:
+            with np.load(self.__output_path(name)) as stored:
+                self.__outputs[name] = {key: stored[key] for key in stored.files if key != "__fingerprint__"}
+        return self.__outputs[name]
+
+    def __perform(self, stage):
+        self.logging.info(textwrap.dedent(f"""\
+          Pipeline:
+            Running stage {stage.name}
+            fingerprint = {stage.fingerprint}"""))
+
+        with span(stage.name), profile_stage(stage.name):
+            inputs = {dependency: self.outputs(dependency) for dependency in stage.depends}
+            outputs = stage.action(inputs, self.rng(stage.name)) or {}
+        self.__outputs[stage.name] = outputs
+
+        if not stage.always:
+            self.__store(stage, outputs)
+
+    def __is_up_to_date(self, stage):
+        if not all(os.path.exists(path) for path in stage.output_files):
+            return False
+        try:
+            with np.load(self.__output_path(stage.name)) as stored:
+                return str(stored["__fingerprint__"]) == stage.fingerprint
+        except (OSError, KeyError, ValueError):
+            return False
+
+    def __store(self, stage, outputs):
+        """
+        writes the outputs aside and renames them, so an interrupted stage
+        is never taken as up to date
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with atomic_write(self.__output_path(stage.name)) as partial_path, open(partial_path, "wb") as stream:
+            np.savez(stream, __fingerprint__=np.array(stage.fingerprint), **outputs)
+
+    def __output_path(self, name):
+        return os.path.join(self.path, f"{name}.npz")
@@ -0,0 +1,292 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import fnmatch
+import functools
+import glob
+import io
+import json
+import os
+import shutil
+import signal
+from collections import Counter
+from contextlib import contextmanager
+
+# settings of the stage being profiled, read by the pool workers it starts
+PROFILE_ENV = "ANALYSIS_PROFILE"
+PROFILE_MODES = ("cprofile", "sample")
+PROFILE_EXTENSIONS = {"cprofile": "prof", "sample": "folded"}
+PROFILE_FILE = "profile"
+SUMMARY_FILE = "profile.txt"
+WORKERS_FOLDER = "profile-workers"
+
+# profiler of the case run by this process, set by Profiler.activate
+_ACTIVE = None
+
+# settings and recorder of a pool worker, created on its first profiled call
+_WORKER = None
+
+
+class StackSampler():
+    """
+    statistical profiler, counting the python stack found every interval
+    of cpu time. The stacks are dumped folded, one per line followed by its
+    count, as taken by flamegraph.pl or speedscope
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.__previous_handler = None
+
+    def enable(self):
+        self.__previous_handler = signal.signal(signal.SIGPROF, self.__sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def disable(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        if self.__previous_handler is not None:
+            signal.signal(signal.SIGPROF, self.__previous_handler)
+            self.__previous_handler = None
+
+    def dump_stats(self, path):
+        """ writes the folded stacks """
+        with open(path, "w") as stream:
+            for stack, count in self.stacks.most_common():
+                stream.write(f"{stack} {count}\n")
+
+    def load_stats(self, path):
+        """ adds the folded stacks of a file """
+        with open(path) as stream:
+            for line in stream:
+                stack, count = line.rstrip("\n").rsplit(" ", 1)
+                self.stacks[stack] += int(count)
+
+    def format_top(self, top=30):
+        """ functions found the most on the sampled stacks, by own and total samples """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            functions = stack.split(";")
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+
+        n_samples = sum(self.stacks.values())
+        lines = [f"{n_samples} samples every {self.interval * 1000:g} ms of cpu time"]
+        for title, counts in (("own", own), ("total", total)):
+            lines += ["", f"{title + ' %':>8}{'samples':>10}  function"]
+            for function, count in counts.most_common(top):
+                lines.append(f"{100 * count / n_samples:>8.1f}{count:>10}  {function}")
+        return "\n".join(lines)
+
+    def __sample(self, _signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_filename}:{code.co_firstlineno}({code.co_name})")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+
+def _recorder(mode, interval):
+    """ cProfile profiler or stack sampler, both enabled, disabled and dumped alike """
+    if mode == "cprofile":
+        import cProfile  # pylint: disable=import-outside-toplevel
+        return cProfile.Profile()
+    if mode == "sample":
+        return StackSampler(interval)
+    raise RuntimeError(f"Unknown profile mode {mode}, expected one of {', '.join(PROFILE_MODES)}")
+
+
+class Profiler():
+    """
+    profiles the chosen stages of a case under cProfile or a stack sampler
+
+    the profile is saved next to the debug.log of the case, along with a
+    summary of its hottest functions. Functions wrapped by profiled and run
+    on a process pool within a profiled stage are profiled in the workers
+    too, and their profiles merged into the one of the case
+    """
+
+    def __init__(self, mode="cprofile", stages=(), top=30, interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise RuntimeError(f"Unknown profile mode {mode}, expected one of {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.stages = tuple(stages or ())
+        self.top = top
+        self.interval = interval
+        self.profiled = []
+        self.pid = None
+        self.output_path = None
+        self.__recorder = None
+
+    def selects(self, name):
+        """ whether a stage is profiled, every one when no stage was chosen """
+        return not self.stages or any(fnmatch.fnmatchcase(name, pattern) for pattern in self.stages)
+
+    @contextmanager
+    def activate(self, output_path, logging):
+        """ profiles the chosen stages run within, saving the profile on exit """
+        global _ACTIVE  # pylint: disable=global-statement
+        self.output_path = output_path
+        self.pid = os.getpid()
+        self.profiled = []
+        self.__recorder = _recorder(self.mode, self.interval)
+        shutil.rmtree(self.__workers_path(), ignore_errors=True)
+
+        previous, _ACTIVE = _ACTIVE, self
+        try:
+            yield self
+        finally:
+            _ACTIVE = previous
+            self.__save(logging)
+
+    @contextmanager
+    def stage(self, name):
+        """ profiles the enclosed block when the stage is chosen """
+        if not self.selects(name):
+            yield
+            return
+
+        self.profiled.append(name)
+        os.environ[PROFILE_ENV] = json.dumps({"mode": self.mode, "interval": self.interval, "path": self.__workers_path()})
+        self.__recorder.enable()
+        try:
+            yield
+        finally:
+            self.__recorder.disable()
+            os.environ.pop(PROFILE_ENV, None)
+
+    def detach(self):
+        """ stops the copy of the profiler a forked worker inherits """
+        self.__recorder.disable()
+
+    def __save(self, logging):
+        """
+        writes the profile, merged with the ones of the workers, and the
+        summary of its hottest functions
+        """
+        if not self.profiled:
+            logging.warning("Profiler: no stage selected by %s was run", ", ".join(self.stages))
+            return
+
+        extension = PROFILE_EXTENSIONS[self.mode]
+        profile_path = os.path.join(self.output_path, f"{PROFILE_FILE}.{extension}")
+        worker_paths = sorted(glob.glob(os.path.join(self.__workers_path(), f"*.{extension}")))
+
+        self.__recorder.dump_stats(profile_path)
+        header = f"{self.mode} profile of stages {', '.join(self.profiled)}, merged with {len(worker_paths)} pool worker profiles\n\n"
+        if self.mode == "cprofile":
+            import pstats  # pylint: disable=import-outside-toplevel
+            stream = io.StringIO()
+            stats = pstats.Stats(profile_path, *worker_paths, stream=stream)
+            stats.dump_stats(profile_path)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            stats.sort_stats("tottime").print_stats(self.top)
+            summary = stream.getvalue()
+        else:
+            for worker_path in worker_paths:
+                self.__recorder.load_stats(worker_path)
+            self.__recorder.dump_stats(profile_path)
+            summary = self.__recorder.format_top(self.top)
+
+        summary_path = os.path.join(self.output_path, SUMMARY_FILE)
+        with open(summary_path, "w") as stream:
+            stream.write(header + summary)
+        shutil.rmtree(self.__workers_path(), ignore_errors=True)
+
+        logging.info("Profiler: profile saved to %s, hottest functions in %s", profile_path, summary_path)
+
+    def __workers_path(self):
+        return os.path.join(self.output_path, WORKERS_FOLDER)
+
+
+@contextmanager
+def profile_stage(name):
+    """ Profiler.stage of the profiler active in this process, if any """
+    if _ACTIVE is None or _ACTIVE.pid != os.getpid():
+        yield
+        return
+    with _ACTIVE.stage(name):
+        yield
+
+
+def profiled(function):
+    """
+    wraps a function submitted to a process pool, so its calls in the
+    workers are profiled when it is submitted within a profiled stage
+    """
+    return functools.partial(_profiled_call, function)
+
+
+def _profiled_call(function, *args, **kwargs):
+    recorder, path = _worker_recorder()
+    if recorder is None:
+        return function(*args, **kwargs)
+
+    recorder.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        recorder.disable()
+        recorder.dump_stats(path)
+
+
+def _worker_recorder():
+    """
+    recorder of this worker and the file it dumps to, None out of a
+    profiled stage or in the process running the case, already profiled
+    """
+    global _ACTIVE, _WORKER  # pylint: disable=global-statement
+    if _ACTIVE is not None:
+        if _ACTIVE.pid == os.getpid():
+            return (None, None)
+        # forked from the process running the case
+        _ACTIVE.detach()
+        _ACTIVE = None
+
+    settings = os.environ.get(PROFILE_ENV)
+    if settings is None:
+        return (None, None)
+
+    if _WORKER is None or _WORKER[0] != settings:
+        options = json.loads(settings)
+        os.makedirs(options["path"], exist_ok=True)
+        path = os.path.join(options["path"], f"{os.getpid()}.{PROFILE_EXTENSIONS[options['mode']]}")
+        _WORKER = (settings, _recorder(options["mode"], options["interval"]), path)
+    return _WORKER[1:]
+
+
+def add_arguments(parser):
+    """ adds the profiling options to an argument parser """
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--profile", choices=PROFILE_MODES, help="profiles the chosen stages under cProfile or a stack sampler")
+    group.add_argument("--profile-stages", type=lambda value: value.split(","), default=(),
+                       help="comma separated stages, or glob patterns of them, to profile, all by default")
+    group.add_argument("--profile-top", type=int, default=30, help="number of functions in the summary of the profile")
+    group.add_argument("--profile-interval", type=float, default=0.005, help="seconds of cpu time between the samples of the stack sampler")
+
+
+def from_arguments(args):
+    """ profiler set by the parsed options, None when not profiling """
+    if args.profile is None:
+        return None
+    return Profiler(args.profile, args.profile_stages, args.profile_top, args.profile_interval)
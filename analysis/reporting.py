@@ -0,0 +1,262 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from .instrumentation import current_path, record_progress
+
+PROGRESS_BACKENDS = ("auto", "bar", "log", "none")
+
+# reporter the progress of the tasks is reported through, set by Reporter.activate
+_ACTIVE = None
+
+
+class Progress():
+    """
+    progress of a task of total units, reported through its reporter at
+    most once per interval
+
+    advancing only adds to a counter until the next report may be due,
+    estimated from the rate so far, so the clock is read about ten times
+    per interval whatever the number of calls and a hot loop may advance
+    once per iteration. When finished, the throughput is recorded into the
+    active metrics, within the span the task was started in
+    """
+
+    def __init__(self, reporter, label, total, unit="events"):
+        self.reporter = reporter
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.finished = False
+        self.path = current_path()
+        self.started = time.perf_counter()
+        self.__reported = self.started
+        self.__due = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        """ units per second so far """
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def eta(self):
+        """ seconds left at the rate so far, None until it is known """
+        rate = self.rate
+        return (self.total - self.done) / rate if rate > 0 else None
+
+    def advance(self, count=1):
+        """ adds count units done """
+        self.done += count
+        if self.done >= self.__due:
+            self.__check()
+
+    def finish(self):
+        """ reports the task as finished and records its throughput, once """
+        if self.finished:
+            return
+        self.finished = True
+        self.reporter.report(self)
+        record_progress(self.label, self.path, self.unit, self.done, self.total, self.elapsed)
+
+    def describe(self):
+        """ one line description, e.g. for a log """
+        if self.finished:
+            return f"{self.label}: {self.done} {self.unit} in {self.elapsed:.1f} s, {self.rate:.3g} {self.unit}/s"
+        eta = f"{self.eta:.0f} s" if self.eta is not None else "-"
+        return (f"{self.label}: {100 * self.fraction:.1f}% ({self.done}/{self.total} {self.unit}), "
+                f"{self.rate:.3g} {self.unit}/s, eta {eta}")
+
+    def __check(self):
+        now = time.perf_counter()
+        if now - self.__reported >= self.reporter.interval:
+            self.__reported = now
+            self.reporter.report(self)
+
+        # the clock is read again after about a tenth of an interval at the current rate
+        rate = self.done / (now - self.started) if now > self.started else 0.0
+        self.__due = self.done + max(1, int(rate * self.reporter.interval / 10))
+
+
+class Reporter():
+    """ creates the progress of the tasks, reporting nothing """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+
+    def progress(self, label, total, unit="events"):
+        return Progress(self, label, total, unit)
+
+    def report(self, progress):
+        """ reports a progress update, and its finish """
+
+    @contextmanager
+    def activate(self):
+        """ makes the module level progress report through this reporter """
+        global _ACTIVE  # pylint: disable=global-statement
+        previous, _ACTIVE = _ACTIVE, self
+        try:
+            yield self
+        finally:
+            _ACTIVE = previous
+
+
+class BarReporter(Reporter):
+    """ reports the progress as terminal bars, one per task """
+
+    def __init__(self, interval=0.2):
+        super().__init__(interval)
+        self.__bars = {}
+
+    def report(self, progress):
+        if id(progress) not in self.__bars:
+            # imported here, headless runs never need it
+            from progress.bar import Bar  # pylint: disable=import-outside-toplevel
+            self.__bars[id(progress)] = Bar(progress.label, max=max(progress.total, 1), suffix='%(percent).1f%% - %(eta)ds')
+        bar = self.__bars[id(progress)]
+        bar.max = max(progress.total, 1)
+        bar.goto(min(progress.done, bar.max))
+        if progress.finished:
+            bar.finish()
+            del self.__bars[id(progress)]
+
+
+class LogReporter(Reporter):
+    """ reports the progress as log lines, for headless runs """
+
+    def __init__(self, logging, interval=10.0):
+        super().__init__(interval)
+        self.logging = logging
+
+    def report(self, progress):
+        self.logging.info(progress.describe())
+
+
+class QueueReporter(Reporter):
+    """
+    sends the progress of the tasks of a worker to a queue, where a
+    ProgressAggregator sums the ones of every worker
+    """
+
+    def __init__(self, queue, source, interval=1.0):
+        super().__init__(interval)
+        self.queue = queue
+        self.source = source
+
+    def report(self, progress):
+        self.queue.put((self.source, progress.label, progress.unit, progress.done, progress.total))
+
+
+class ProgressAggregator():
+    """
+    reports through a reporter the progress of parallel workers, summed
+    by task label over the workers sending theirs through QueueReporters
+    """
+
+    def __init__(self, queue, reporter):
+        self.queue = queue
+        self.reporter = reporter
+        self.__tasks = {}
+        self.__progress = {}
+
+    @contextmanager
+    def run(self):
+        """ aggregates the queued progress within, on a thread """
+        thread = threading.Thread(target=self.__consume, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            self.queue.put(None)
+            thread.join()
+            for progress in self.__progress.values():
+                progress.finish()
+
+    def __consume(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            source, label, unit, done, total = message
+            self.__tasks[(label, unit, source)] = (done, total)
+
+            tasks = [task for key, task in self.__tasks.items() if key[:2] == (label, unit)]
+            if (label, unit) not in self.__progress:
+                self.__progress[(label, unit)] = self.reporter.progress(label, total, unit)
+            progress = self.__progress[(label, unit)]
+            progress.total = sum(task[1] for task in tasks)
+            progress.advance(sum(task[0] for task in tasks) - progress.done)
+
+
+def progress(label, total, unit="events"):
+    """ progress of a task, reported through the active reporter, if any """
+    return (_ACTIVE or _NULL_REPORTER).progress(label, total, unit)
+
+
+def reporter_for(backend, logging, interval=None):
+    """
+    reporter of a backend, auto being a bar on a terminal and log lines
+    otherwise, e.g. when the output goes to a batch log file
+    """
+    if backend == "auto":
+        backend = "bar" if sys.stderr.isatty() else "log"
+    options = {} if interval is None else {"interval": interval}
+    if backend == "bar":
+        return BarReporter(**options)
+    if backend == "log":
+        return LogReporter(logging, **options)
+    if backend == "none":
+        return Reporter(**options)
+    raise RuntimeError(f"Unknown progress backend {backend}, expected one of {', '.join(PROGRESS_BACKENDS)}")
+
+
+def add_arguments(parser):
+    """ adds the progress options to an argument parser """
+    group = parser.add_argument_group("progress")
+    group.add_argument("--progress", choices=PROGRESS_BACKENDS, default="auto",
+                       help="progress as a terminal bar, log lines or none, auto picks the bar on a terminal")
+    group.add_argument("--progress-interval", type=float, help="seconds between progress updates, 0.2 for the bar and 10 for the log by default")
+
+
+def from_arguments(args, logging):
+    """ reporter set by the parsed options """
+    return reporter_for(args.progress, logging, args.progress_interval)
+
+
+_NULL_REPORTER = Reporter()
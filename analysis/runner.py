@@ -0,0 +1,94 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import zlib
+from contextlib import nullcontext
+import numpy as np
+from .instrumentation import Metrics
+from .pipeline import Pipeline
+from .utils import read_yaml_file
+from .tasks import GenerateDatasetTask, CompareFiltersTask
+
+
+METRICS_FILE = "metrics.json"
+
+
+def case_name(input_file):
+    """ name of the case, given by the folder holding its setup file """
+    return os.path.basename(os.path.dirname(os.path.abspath(input_file)))
+
+
+def case_seed_sequence(input_file, seed=1):
+    """
+    seed sequence of a case, derived from the base seed and the case name,
+    so each case has its own stream whatever the order it runs in
+    """
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(case_name(input_file).encode("utf-8")),))
+
+
+def run_case(input_file, logging, seed=1, profiler=None):
+    """
+    generates the dataset of a case and compares the filters over it,
+    profiling the stages chosen by the profiler, if any
+    """
+    output_path = os.path.dirname(os.path.abspath(input_file))
+
+    _, yml = read_yaml_file(input_file)
+
+    # each stage derives its random stream from the case one
+    pipeline = Pipeline(output_path, logging, case_seed_sequence(input_file, seed))
+    GenerateDatasetTask(yml, output_path, logging, seed=seed).add_stages(pipeline)
+    CompareFiltersTask(yml, output_path, logging).add_stages(pipeline)
+
+    # the spans of every stage are written even when the case fails
+    metrics = Metrics()
+    try:
+        with metrics.activate(), profiler.activate(output_path, logging) if profiler is not None else nullcontext():
+            performed = pipeline.run()
+    finally:
+        metrics.write(os.path.join(output_path, METRICS_FILE), case=case_name(input_file))
+        logging.info(format_metrics(metrics))
+
+    return performed
+
+
+def format_metrics(metrics):
+    """
+    formats the spans as a table of wall, self and cpu time, memory and
+    events per second, followed by the throughput of the reported tasks
+    """
+    lines = ["Metrics:", f"  {'span':<36}{'wall s':>10}{'self s':>10}{'cpu s':>10}{'peak MB':>10}{'events/s':>14}"]
+    for span in metrics.spans:
+        measures = span.as_dict()
+        rate = measures.get("events_per_second")
+        rate = f"{rate:.0f}" if rate is not None else "-"
+        lines.append(
+            f"  {'  ' * span.path.count('/') + span.name:<36}"
+            f"{measures['wall_seconds']:>10.3f}{measures['self_seconds']:>10.3f}{measures['cpu_seconds']:>10.3f}"
+            f"{measures['peak_rss_mb']:>10.0f}{rate:>14}"
+        )
+    if metrics.progress:
+        lines.append("  throughput of the reported tasks:")
+    for task in metrics.progress:
+        rate = f"{task['rate']:.3g} {task['unit']}/s" if task["rate"] is not None else "-"
+        lines.append(f"    {task['label']} ({task['path']}): {task['done']} {task['unit']} in {task['seconds']:.3f} s, {rate}")
+    return "\n".join(lines)
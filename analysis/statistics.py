@@ -0,0 +1,259 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import numpy as np
+
+
+class CovarianceAccumulator():
+    """
+    online mean and covariance of the rows of a stream of blocks
+
+    blocks are combined with the pairwise update of Chan et al., so
+    accumulators filled apart, e.g. one per shard, can be merged
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.comoment = np.zeros((size, size))
+
+    @classmethod
+    def from_moments(cls, count, mean, comoment):
+        """ accumulator restored from the moments of another one """
+        instance = cls(len(mean))
+        instance.count = int(count)
+        instance.mean = np.array(mean, dtype=float)
+        instance.comoment = np.array(comoment, dtype=float)
+        return instance
+
+    @classmethod
+    def from_blocks(cls, blocks, size):
+        """ accumulator filled with every block of an iterable """
+        instance = cls(size)
+        for block in blocks:
+            instance.update(block)
+        return instance
+
+    @classmethod
+    def from_dataset(cls, dataset, chunk_size=100000):
+        """
+        accumulator filled with a dataset, chunk by chunk, so a
+        memory-mapped dataset is never read as a whole
+        """
+        blocks = (dataset[start:start + chunk_size] for start in range(0, len(dataset), chunk_size))
+        return cls.from_blocks(blocks, dataset.shape[1])
+
+    def update(self, block):
+        """
+        adds the rows of an (n, size) block
+        """
+        block = np.asarray(block, dtype=float)
+        if block.ndim != 2 or block.shape[1] != self.size:
+            raise ValueError("Incompatible input size")
+        if len(block) == 0:
+            return self
+
+        block_mean = block.mean(axis=0)
+        centered = block - block_mean
+        self.__combine(len(block), block_mean, centered.T @ centered)
+        return self
+
+    def merge(self, other):
+        """
+        adds the rows accumulated by other
+        """
+        if other.size != self.size:
+            raise ValueError("Incompatible input size")
+        if other.count > 0:
+            self.__combine(other.count, other.mean, other.comoment)
+        return self
+
+    def covariance(self, ddof=1):
+        """
+        covariance matrix of the accumulated rows, as np.cov(rowvar=False)
+        """
+        if self.count <= ddof:
+            raise ValueError("Not enough samples to estimate the covariance")
+        return self.comoment / (self.count - ddof)
+
+    def __combine(self, count, mean, comoment):
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.comoment += comoment + np.outer(delta, delta) * (self.count * count / total)
+        self.mean += delta * (count / total)
+        self.count = total
+
+
+class ErrorAccumulator():
+    """
+    online statistics of the estimation errors, estimate - truth
+
+    keeps the mean and the spread with the pairwise update of Chan et al.,
+    a histogram of the errors and, when bin edges are given, the count,
+    sum and sum of squares of the errors binned by truth amplitude and
+    phase. Accumulators filled apart can be merged
+    """
+
+    def __init__(self, histogram_bins=100, histogram_range=(-50.0, 50.0), amplitude_bins=None, phase_bins=None):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.histogram_edges = np.linspace(histogram_range[0], histogram_range[1], histogram_bins + 1)
+        self.histogram = np.zeros(histogram_bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.binned = {}
+        for name, edges in (("amplitude", amplitude_bins), ("phase", phase_bins)):
+            if edges is not None:
+                self.binned[name] = {"edges": np.asarray(edges, dtype=float), "moments": np.zeros((3, len(edges) - 1))}
+
+    @classmethod
+    def from_state(cls, state):
+        """ accumulator restored from the state of another one """
+        instance = cls(histogram_bins=len(state["histogram"]))
+        instance.count = int(state["count"])
+        instance.mean = float(state["mean"])
+        instance.m2 = float(state["m2"])
+        instance.histogram_edges = np.array(state["histogram_edges"], dtype=float)
+        instance.histogram = np.array(state["histogram"], dtype=np.int64)
+        instance.underflow = int(state["underflow"])
+        instance.overflow = int(state["overflow"])
+        for name in ("amplitude", "phase"):
+            if f"{name}_edges" in state:
+                instance.binned[name] = {
+                    "edges": np.array(state[f"{name}_edges"], dtype=float),
+                    "moments": np.array(state[f"{name}_moments"], dtype=float),
+                }
+        return instance
+
+    def update(self, errors, amplitudes=None, phases=None):
+        """
+        adds a block of errors, along with the truth amplitudes and phases
+        they are binned by
+        """
+        errors = np.asarray(errors, dtype=float).ravel()
+        if errors.size == 0:
+            return self
+
+        block_mean = errors.mean()
+        self.__combine(errors.size, block_mean, np.sum((errors - block_mean) ** 2))
+
+        histogram, _ = np.histogram(errors, self.histogram_edges)
+        self.histogram += histogram
+        self.underflow += int(np.count_nonzero(errors < self.histogram_edges[0]))
+        self.overflow += int(np.count_nonzero(errors > self.histogram_edges[-1]))
+
+        for name, values in (("amplitude", amplitudes), ("phase", phases)):
+            if name not in self.binned:
+                continue
+            if values is None:
+                raise ValueError(f"Errors binned by {name} need the truth {name}s")
+            self.__update_binned(self.binned[name], np.asarray(values, dtype=float).ravel(), errors)
+        return self
+
+    def merge(self, other):
+        """
+        adds the errors accumulated by other, which must share the bins
+        """
+        if not np.array_equal(other.histogram_edges, self.histogram_edges) or other.binned.keys() != self.binned.keys():
+            raise ValueError("Incompatible accumulator bins")
+        if other.count == 0:
+            return self
+
+        self.__combine(other.count, other.mean, other.m2)
+        self.histogram += other.histogram
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        for name, binned in other.binned.items():
+            self.binned[name]["moments"] += binned["moments"]
+        return self
+
+    @property
+    def std(self):
+        """ standard deviation of the errors """
+        return np.sqrt(self.m2 / self.count) if self.count else np.nan
+
+    @property
+    def rms(self):
+        """ root mean square of the errors """
+        return np.sqrt(self.m2 / self.count + self.mean ** 2) if self.count else np.nan
+
+    def binned_summary(self, name):
+        """
+        count, mean and rms of the errors within each bin of the truth
+        amplitude or phase
+        """
+        edges = self.binned[name]["edges"]
+        count, total, squares = self.binned[name]["moments"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {"edges": edges, "count": count, "mean": total / count, "rms": np.sqrt(squares / count)}
+
+    def summary(self):
+        """ scalar metrics of the errors """
+        return {
+            "count": self.count,
+            "mean": float(self.mean) if self.count else np.nan,
+            "std": float(self.std),
+            "rms": float(self.rms),
+            "underflow": self.underflow,
+            "overflow": self.overflow,
+        }
+
+    def state(self):
+        """ arrays the accumulator can be restored from """
+        state = {
+            "count": np.array(self.count),
+            "mean": np.array(self.mean),
+            "m2": np.array(self.m2),
+            "histogram_edges": self.histogram_edges,
+            "histogram": self.histogram,
+            "underflow": np.array(self.underflow),
+            "overflow": np.array(self.overflow),
+        }
+        for name, binned in self.binned.items():
+            state[f"{name}_edges"] = binned["edges"]
+            state[f"{name}_moments"] = binned["moments"]
+        return state
+
+    def __combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+
+        self.m2 += m2 + delta ** 2 * (self.count * count / total)
+        self.mean += delta * (count / total)
+        self.count = total
+
+    @staticmethod
+    def __update_binned(binned, values, errors):
+        edges = binned["edges"]
+        indexes = np.searchsorted(edges, values, side="right") - 1
+        inside = ((indexes >= 0) & (indexes < len(edges) - 1)) | (values == edges[-1])
+        indexes = np.minimum(indexes[inside], len(edges) - 2)
+        errors = errors[inside]
+
+        n_bins = len(edges) - 1
+        binned["moments"] += np.array([
+            np.bincount(indexes, minlength=n_bins),
+            np.bincount(indexes, weights=errors, minlength=n_bins),
+            np.bincount(indexes, weights=errors ** 2, minlength=n_bins),
+        ])
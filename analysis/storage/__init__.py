@@ -0,0 +1,15 @@
+from ..lazy import lazy_exports
+
+# exported names and the submodules defining them, imported on first access
+_EXPORTS = {
+    "DatasetStorage": ".base",
+    "BinaryStorage": ".binary",
+    "ColumnarFile": ".columnar",
+    "CsvStorage": ".text",
+    "get_dataset_storage": ".registry",
+    "DatasetCache": ".cache",
+    "ResultsStorage": ".results",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
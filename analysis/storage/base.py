@@ -0,0 +1,92 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+from ..cache import atomic_write
+
+
+class DatasetStorage():
+    """ abstract class for dataset storages """
+
+    extension = ""
+
+    # whether the dataset file holds its metadata, otherwise kept in a json file next to it
+    embeds_metadata = False
+
+    def __init__(self, output_path, name="dataset"):
+        self.path = f"{output_path}/{name}.{self.extension}"
+        self.metadata_path = f"{self.path}.json"
+
+    def exists(self):
+        """ whether the dataset was already stored """
+        return os.path.exists(self.path)
+
+    def write(self, blocks, n_events, window_size, metadata=None):
+        """
+        writes the dataset from an iterable of (n, window_size) blocks
+
+        the blocks go to a partial file, which is renamed when complete,
+        so an interrupted run is never taken as a finished dataset. The
+        metadata of the former dataset, if any, is removed beforehand
+        """
+        if not self.embeds_metadata and os.path.exists(self.metadata_path):
+            os.remove(self.metadata_path)
+
+        with atomic_write(self.path) as partial_path:
+            self._write(partial_path, blocks, n_events, window_size, metadata or {})
+
+        if metadata is not None:
+            self.write_metadata(metadata)
+
+    def read(self):
+        """ abstract method for reading the whole (n_events, window_size) dataset """
+        raise NotImplementedError
+
+    def read_metadata(self):
+        """ metadata stored with the dataset, None when there is none """
+        try:
+            with open(self.metadata_path, "r") as stream:
+                return json.load(stream)
+        except (OSError, ValueError):
+            return None
+
+    def write_metadata(self, metadata):
+        """
+        stores the metadata of the dataset in the json file next to it,
+        storages embedding it write it along with the dataset instead
+        """
+        if self.embeds_metadata:
+            return
+        with atomic_write(self.metadata_path) as partial_path, open(partial_path, "w") as stream:
+            json.dump(metadata, stream, default=str)
+
+    def iter_blocks(self, chunk_size):
+        """
+        yields the stored dataset in blocks of chunk_size events
+        """
+        dataset = self.read()
+        for start in range(0, len(dataset), chunk_size):
+            yield dataset[start:start + chunk_size]
+
+    def _write(self, path, blocks, n_events, window_size, metadata):
+        """ abstract method for writing the blocks to path """
+        raise NotImplementedError
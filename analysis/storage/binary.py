@@ -0,0 +1,56 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import numpy as np
+from .base import DatasetStorage
+from .columnar import ColumnarFile
+
+
+class BinaryStorage(DatasetStorage):
+    """ dataset stored as a memory-mappable columnar file """
+
+    extension = "bin"
+    embeds_metadata = True
+
+    def _write(self, path, blocks, n_events, window_size, metadata):
+        output = ColumnarFile.create(path, {"samples": ((n_events, window_size), np.float64)}, metadata)
+        samples = output["samples"]
+
+        row = 0
+        for block in blocks:
+            samples[row:row + len(block)] = block
+            row += len(block)
+
+        output.flush()
+        if row != n_events:
+            raise RuntimeError(f"Expected {n_events} events, got {row}")
+
+    def read(self):
+        """
+        memory-maps the dataset, so slices of it are views on the file
+        """
+        return ColumnarFile.open(self.path)["samples"]
+
+    def read_metadata(self):
+        """
+        reads the setup the dataset was generated with
+        """
+        return ColumnarFile.open(self.path).metadata
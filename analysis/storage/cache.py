@@ -0,0 +1,180 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import shutil
+import time
+from ..cache import atomic_write, content_hash, default_cache_path, default_dataset_cache_size
+
+# bumped whenever the generator changes the datasets a setup produces
+DATASET_CACHE_VERSION = 1
+
+# dataset generator options that do not change the generated samples
+NON_CONTENT_OPTIONS = ("cache", "export_csv", "storage", "workers")
+
+
+class DatasetCache():
+    """
+    content-addressed store of generated datasets, shared by every case
+
+    each entry is a dataset file named after its key, next to a json file
+    with its metadata. Entries are linked into the case folders, so a hit
+    costs no copy, and the least recently used ones are evicted when the
+    cache grows over max_size bytes
+    """
+
+    def __init__(self, path=None, max_size=None):
+        self.path = os.path.join(path or default_cache_path(), "datasets")
+        self.max_size = max_size if max_size is not None else default_dataset_cache_size()
+
+    @staticmethod
+    def dataset_key(setup, seed):
+        """
+        canonical hash of everything the dataset of a setup depends on:
+        the pulse shape contents, the pulse and dataset generator parameters
+        and the seed
+        """
+        pulse_shape = dict(setup["pulse_shape"])
+        with open(pulse_shape.pop("path"), "rb") as shape_file:
+            pulse_shape["contents"] = content_hash(shape_file.read())
+
+        dataset_generator = {key: value for key, value in setup["dataset_generator"].items()
+                             if key not in NON_CONTENT_OPTIONS}
+
+        parameters = {
+            "version": DATASET_CACHE_VERSION,
+            "pulse_shape": pulse_shape,
+            "pulse_generator": setup["pulse_generator"],
+            "dataset_generator": dataset_generator,
+            "seed": seed,
+        }
+        return content_hash(json.dumps(parameters, sort_keys=True, separators=(",", ":")))
+
+    def entry_path(self, key, extension):
+        """ dataset file of an entry """
+        return os.path.join(self.path, f"{key}.{extension}")
+
+    def fetch(self, key, target_path):
+        """
+        places the cached dataset of key at target_path, returning whether
+        the cache held it
+        """
+        extension = os.path.splitext(target_path)[1][1:]
+        entry_path = self.entry_path(key, extension)
+        if not os.path.exists(entry_path):
+            return False
+
+        self.__place(entry_path, target_path)
+        self.__touch(key, extension)
+        return True
+
+    def store(self, key, source_path, metadata=None):
+        """
+        adds the dataset at source_path to the cache under key, then evicts
+        the least recently used entries over the size bound. Returns whether
+        it could be stored, as a cache that cannot be written, e.g. on a
+        full disk, only costs a regeneration
+        """
+        extension = os.path.splitext(source_path)[1][1:]
+        entry_path = self.entry_path(key, extension)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            self.__place(source_path, entry_path)
+
+            now = time.time()
+            self.__write_metadata(key, extension, {
+                "key": key,
+                "extension": extension,
+                "size": os.path.getsize(entry_path),
+                "created": now,
+                "last_used": now,
+                **(metadata or {}),
+            })
+        except OSError:
+            if os.path.exists(entry_path):
+                os.remove(entry_path)
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """ metadata of every entry """
+        if not os.path.isdir(self.path):
+            return []
+
+        entries = []
+        for filename in os.listdir(self.path):
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(self.path, filename), "r") as stream:
+                        entries.append(json.load(stream))
+                except (OSError, ValueError):
+                    continue
+        return entries
+
+    def evict(self):
+        """
+        removes the least recently used entries until the cache fits in
+        max_size, returning the removed keys
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry["last_used"])
+        total_size = sum(entry["size"] for entry in entries)
+
+        evicted = []
+        for entry in entries:
+            if total_size <= self.max_size:
+                break
+            for path in (self.entry_path(entry["key"], entry["extension"]), self.__metadata_path(entry["key"], entry["extension"])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_size -= entry["size"]
+            evicted.append(entry["key"])
+        return evicted
+
+    def __place(self, source_path, target_path):
+        """
+        hard links source_path at target_path, copying when the file system
+        does not allow it, through a partial file renamed when complete
+        """
+        with atomic_write(target_path) as partial_path:
+            try:
+                os.link(source_path, partial_path)
+            except OSError:
+                shutil.copyfile(source_path, partial_path)
+
+    def __touch(self, key, extension):
+        try:
+            with open(self.__metadata_path(key, extension), "r") as stream:
+                metadata = json.load(stream)
+        except (OSError, ValueError):
+            return
+        metadata["last_used"] = time.time()
+        self.__write_metadata(key, extension, metadata)
+
+    def __metadata_path(self, key, extension):
+        return os.path.join(self.path, f"{key}.{extension}.json")
+
+    def __write_metadata(self, key, extension, metadata):
+        with atomic_write(self.__metadata_path(key, extension)) as partial_path, open(partial_path, "w") as stream:
+            json.dump(metadata, stream, indent=2)
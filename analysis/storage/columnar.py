@@ -0,0 +1,104 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import numpy as np
+
+
+class ColumnarFile():
+    """ binary file of named arrays with a JSON metadata header """
+
+    MAGIC = b"JCAECOL1"
+    ALIGNMENT = 64
+
+    def __init__(self, path, metadata, columns):
+        self.path = path
+        self.metadata = metadata
+        self.columns = columns
+
+    @classmethod
+    def create(cls, path, columns, metadata=None):
+        """
+        creates the file with room for every column and returns it
+        opened for writing. columns maps each name to a (shape, dtype) pair
+        """
+        metadata = metadata or {}
+        layout = {}
+        offset = 0
+        for name, (shape, dtype) in columns.items():
+            dtype = np.dtype(dtype)
+            layout[name] = {"dtype": dtype.str, "shape": [int(n) for n in np.atleast_1d(shape)], "offset": offset}
+            offset = cls.__align(offset + int(np.prod(shape)) * dtype.itemsize)
+
+        # the header length depends on the offsets, so they are made relative to the data section
+        header = json.dumps({"metadata": metadata, "columns": layout}).encode("utf-8")
+        data_start = cls.__align(len(cls.MAGIC) + 8 + len(header))
+
+        with open(path, mode="wb") as output:
+            output.write(cls.MAGIC)
+            output.write(len(header).to_bytes(8, "little"))
+            output.write(header)
+            output.truncate(data_start + offset)
+
+        return cls.__map(path, metadata, layout, data_start, "r+")
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        """
+        opens an existing file, every column is memory-mapped
+        """
+        with open(path, mode="rb") as stream:
+            if stream.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise RuntimeError(f"{path} is not a columnar file")
+            header_size = int.from_bytes(stream.read(8), "little")
+            header = json.loads(stream.read(header_size).decode("utf-8"))
+
+        data_start = cls.__align(len(cls.MAGIC) + 8 + header_size)
+        return cls.__map(path, header["metadata"], header["columns"], data_start, mode)
+
+    @classmethod
+    def __map(cls, path, metadata, layout, data_start, mode):
+        columns = {}
+        for name, column in layout.items():
+            shape = tuple(column["shape"])
+            if int(np.prod(shape)) == 0:
+                columns[name] = np.zeros(shape, dtype=column["dtype"])
+                continue
+            columns[name] = np.memmap(path, dtype=column["dtype"], mode=mode, offset=data_start + column["offset"], shape=shape)
+        return cls(path, metadata, columns)
+
+    @classmethod
+    def __align(cls, size):
+        return -(-size // cls.ALIGNMENT) * cls.ALIGNMENT
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def flush(self):
+        """
+        writes the pending changes to disk
+        """
+        for column in self.columns.values():
+            if isinstance(column, np.memmap):
+                column.flush()
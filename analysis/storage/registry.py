@@ -0,0 +1,35 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from .binary import BinaryStorage
+from .text import CsvStorage
+
+STORAGES = {
+    "binary": BinaryStorage,
+    "csv": CsvStorage,
+}
+
+
+def get_dataset_storage(name, output_path):
+    """ builds the dataset storage registered as name """
+    if name not in STORAGES:
+        raise RuntimeError(f"Unknown dataset storage: {name}")
+    return STORAGES[name](output_path)
@@ -0,0 +1,90 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import numpy as np
+from ..cache import atomic_write
+from .columnar import ColumnarFile
+
+
+class ResultsStorage():
+    """
+    results of a case stored as one columnar file of named arrays, e.g.
+    amplitude_truth or amplitude_estimated/blue
+    """
+
+    extension = "bin"
+
+    def __init__(self, output_path, name="results"):
+        self.output_path = output_path
+        self.path = f"{output_path}/{name}.{self.extension}"
+
+    def exists(self):
+        """ whether the results were already stored """
+        return os.path.exists(self.path)
+
+    def write(self, columns, metadata=None, row_columns=None, row_blocks=()):
+        """
+        writes the columns in bulk, through a partial file renamed when
+        complete. The row columns, given as name: (shape, dtype), are
+        filled block by block from the dicts of arrays of row_blocks
+        """
+        columns = {name: np.asarray(data) for name, data in columns.items()}
+        row_columns = row_columns or {}
+        layout = {name: (data.shape, data.dtype) for name, data in columns.items()}
+        layout.update(row_columns)
+        with atomic_write(self.path) as partial_path:
+            output = ColumnarFile.create(partial_path, layout, metadata)
+            for name, data in columns.items():
+                output[name][...] = data
+
+            rows = dict.fromkeys(row_columns, 0)
+            for block in row_blocks:
+                for name, data in block.items():
+                    output[name][rows[name]:rows[name] + len(data)] = data
+                    rows[name] += len(data)
+
+            output.flush()
+            del output
+
+            for name, (shape, _) in row_columns.items():
+                if rows[name] != np.atleast_1d(shape)[0]:
+                    raise RuntimeError(f"Expected {np.atleast_1d(shape)[0]} rows of {name}, got {rows[name]}")
+
+    def read(self):
+        """
+        memory-maps the results, each column is an array
+        """
+        return ColumnarFile.open(self.path)
+
+    def export_csv(self, prefix="results"):
+        """
+        writes each column as a comma separated file named after it,
+        e.g. results_amplitude_estimated_blue.csv, returning their paths
+        """
+        results = self.read()
+        paths = []
+        for name in results.columns:
+            path = f"{self.output_path}/{prefix}_{name.replace('/', '_')}.csv"
+            data = results[name]
+            np.savetxt(path, data.reshape(len(data), -1), delimiter=",", fmt="%.17g")
+            paths.append(path)
+        return paths
@@ -0,0 +1,50 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from itertools import islice
+import numpy as np
+from .base import DatasetStorage
+
+
+class CsvStorage(DatasetStorage):
+    """ dataset stored as a space separated text file """
+
+    extension = "csv"
+
+    def _write(self, path, blocks, n_events, window_size, metadata):
+        with open(path, mode="w") as output:
+            for block in blocks:
+                np.savetxt(output, block, delimiter=" ", fmt="%.5f")
+
+    def read(self):
+        return np.loadtxt(self.path, ndmin=2)
+
+    def iter_blocks(self, chunk_size):
+        """
+        parses the file chunk_size lines at a time, so it is never
+        loaded as a whole
+        """
+        with open(self.path) as stream:
+            while True:
+                lines = list(islice(stream, chunk_size))
+                if not lines:
+                    return
+                yield np.loadtxt(lines, ndmin=2)
@@ -0,0 +1,216 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import glob
+import json
+import os
+import numpy as np
+from .cache import atomic_write
+from .storage import ColumnarFile
+
+SUMMARY_FILE = "summary.json"
+INDEX_FILE = "summary.bin"
+
+
+def flatten_parameters(setup, prefix=""):
+    """
+    flattens the nested setup into dotted names, e.g.
+    dataset_generator.pileup_occupancy. Lists are kept as json strings
+    """
+    parameters = {}
+    for key, value in setup.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            parameters.update(flatten_parameters(value, f"{name}."))
+        elif isinstance(value, (list, tuple)):
+            parameters[name] = json.dumps(value)
+        else:
+            parameters[name] = value
+    return parameters
+
+
+def case_summary(case, setup, errors):
+    """
+    summary record of a case: its name, the parameters of its setup and the
+    error statistics of each filter, named as rms/blue
+    """
+    record = {"case": case}
+    record.update(flatten_parameters(setup))
+    for filter_name, statistics in errors.items():
+        for metric, value in statistics.items():
+            record[f"{metric}/{filter_name}"] = value
+    return record
+
+
+def write_case_summary(output_path, record):
+    """ writes the summary record of a case into its folder """
+    with atomic_write(os.path.join(output_path, SUMMARY_FILE)) as partial_path, open(partial_path, "w") as stream:
+        json.dump(record, stream, indent=2)
+
+
+class SummaryIndex():
+    """
+    summary records of many cases as one table, a column per parameter or
+    metric and a row per case, stored as a columnar file
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def collect(cls, cases_path):
+        """ index of the summary records found in the case folders """
+        records = []
+        for summary_file in sorted(glob.glob(os.path.join(cases_path, "*", SUMMARY_FILE))):
+            with open(summary_file, "r") as stream:
+                records.append(json.load(stream))
+        return cls.from_records(records)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        index of the given records. A parameter missing from a record is
+        NaN in numeric columns and empty in text ones
+        """
+        names = []
+        for record in records:
+            names += [name for name in record if name not in names]
+
+        columns = {}
+        for name in names:
+            values = [record.get(name) for record in records]
+            present = [value for value in values if value is not None]
+            if all(isinstance(value, (bool, int, float)) for value in present):
+                columns[name] = np.array([np.nan if value is None else value for value in values], dtype=float)
+            else:
+                columns[name] = np.array(["" if value is None else str(value) for value in values])
+        return cls(columns)
+
+    @classmethod
+    def load(cls, path):
+        """ reads an index written by save """
+        index_file = ColumnarFile.open(path)
+        return cls({name: np.asarray(index_file[name]) for name in index_file.metadata["order"]})
+
+    def save(self, path):
+        """ writes the index as a columnar file, through a partial file renamed when complete """
+        with atomic_write(path) as partial_path:
+            output = ColumnarFile.create(partial_path, {name: (data.shape, data.dtype) for name, data in self.columns.items()},
+                                         {"order": list(self.columns)})
+            for name, data in self.columns.items():
+                output[name][...] = data
+            output.flush()
+            del output
+
+    def __len__(self):
+        return len(self.columns["case"]) if "case" in self.columns else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def query(self, **conditions):
+        """
+        cases matching every condition, given by column name with dots and
+        slashes replaced by double underscores, e.g.
+        query(dataset_generator__pileup_occupancy=0.5). A condition is
+        either a value or a function of the column returning a mask
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, condition in conditions.items():
+            column = self.columns[self.__column_name(key)]
+            mask &= condition(column) if callable(condition) else column == condition
+        return self.select(mask)
+
+    def select(self, rows):
+        """ index with the given rows, as a mask or indexes """
+        return SummaryIndex({name: data[rows] for name, data in self.columns.items()})
+
+    def sort(self, name):
+        """ index sorted by a column """
+        return self.select(np.argsort(self.columns[name], kind="stable"))
+
+    def metrics(self, metric="rms"):
+        """ columns of a metric, by filter """
+        prefix = f"{metric}/"
+        return {name[len(prefix):]: data for name, data in self.columns.items() if name.startswith(prefix)}
+
+    def plot(self, x, metric="rms", filters=None, axis=None):
+        """
+        plots a metric of each filter against a column, e.g.
+        plot("dataset_generator.pileup_occupancy")
+        """
+        import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+
+        axis = axis or plt.gca()
+        order = np.argsort(self.columns[x], kind="stable")
+        for filter_name, values in self.metrics(metric).items():
+            if filters is None or filter_name in filters:
+                axis.plot(self.columns[x][order], values[order], "o-", label=filter_name)
+        axis.set_xlabel(x)
+        axis.set_ylabel(metric)
+        axis.legend()
+        return axis
+
+    def format_table(self, metric="rms"):
+        """ formats a metric of each filter as a table with a row per case """
+        metrics = self.metrics(metric)
+        width = max([len("case")] + [len(case) for case in self.columns.get("case", [])])
+        lines = [f"{'case':<{width}}" + "".join(f"{name:>12}" for name in metrics)]
+        lines.append("-" * len(lines[0]))
+        for row in range(len(self)):
+            lines.append(f"{self.columns['case'][row]:<{width}}" + "".join(f"{values[row]:>12.4f}" for values in metrics.values()))
+        return "\n".join(lines)
+
+    def __column_name(self, key):
+        if key in self.columns:
+            return key
+        for name in self.columns:
+            if name.replace(".", "__").replace("/", "__") == key:
+                return name
+        raise KeyError(key)
+
+
+def build_index(cases_path):
+    """ collects the case summaries of a folder into its index file """
+    index = SummaryIndex.collect(cases_path)
+    index.save(os.path.join(cases_path, INDEX_FILE))
+    return index
+
+
+def main():
+    """
+    main function
+    """
+    parser = argparse.ArgumentParser(prog="python -m analysis.summary", description="Indexes and compares the case summaries of a folder")
+    parser.add_argument("cases_path", help="folder holding one subfolder per case")
+    parser.add_argument("-m", "--metric", default="rms", help="error metric to compare, e.g. mean, std or rms")
+    args = parser.parse_args()
+
+    index = build_index(args.cases_path)
+    print(index.sort("case").format_table(args.metric))
+
+
+if __name__ == '__main__':
+    main()
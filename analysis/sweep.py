@@ -0,0 +1,174 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from . import profiling, reporting
+from .runner import case_name, run_case
+from .summary import INDEX_FILE, build_index
+
+LOG_FORMAT = '%(asctime)s %(process)s %(levelname)s %(name)s %(message)s'
+
+
+def discover_cases(cases_path, pattern="*"):
+    """
+    lists the setup files of the case folders within cases_path
+    """
+    setup_files = []
+    for extension in ("yaml", "yml"):
+        setup_files += glob.glob(os.path.join(cases_path, pattern, f"setup.{extension}"))
+    return sorted(setup_files)
+
+
+def run_case_isolated(input_file, seed, profiler=None, progress_queue=None):
+    """
+    runs a case logging to its own debug.log, any failure is reported
+    in the returned record instead of being raised. The progress of its
+    tasks is sent to progress_queue, when given
+    """
+    output_path = os.path.dirname(os.path.abspath(input_file))
+    name = case_name(input_file)
+
+    logger = logging.getLogger(f"analysis.sweep.{name}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = logging.FileHandler(output_path + '/debug.log')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+
+    record = {"case": name, "status": "done", "seconds": 0.0, "error": ""}
+    start_time = time.time()
+    try:
+        logger.info("Starting analysis")
+        logger.info("Input: %s", input_file)
+        logger.info("Output: %s", output_path)
+        reporter = reporting.QueueReporter(progress_queue, name) if progress_queue is not None else reporting.Reporter()
+        with reporter.activate():
+            run_case(input_file, logger, seed, profiler)
+        logger.info("Task finished after %d seconds", time.time() - start_time)
+    except Exception as error:  # pylint: disable=broad-except
+        logger.exception(error)
+        record["status"] = "failed"
+        record["error"] = f"{type(error).__name__}: {error}"
+    finally:
+        record["seconds"] = time.time() - start_time
+        logger.removeHandler(handler)
+        handler.close()
+
+    return record
+
+
+def run_sweep(setup_files, workers=None, seed=1, profiler=None, reporter=None):
+    """
+    runs every case in a process of its own and returns their records, each
+    case profiled into its own folder when a profiler is given. The
+    progress of the cases is summed and reported through the reporter
+    """
+    if reporter is None:
+        return run_cases(setup_files, workers, seed, profiler)
+
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+        with reporting.ProgressAggregator(progress_queue, reporter).run():
+            return run_cases(setup_files, workers, seed, profiler, progress_queue)
+
+
+def run_cases(setup_files, workers=None, seed=1, profiler=None, progress_queue=None):
+    """
+    runs the cases, up to workers at once, and returns their records
+    """
+    records = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_case_in_process, setup_file, seed, profiler, progress_queue) for setup_file in setup_files]
+        for future in as_completed(futures):
+            record = future.result()
+            print(f"{record['case']}: {record['status']} after {record['seconds']:.1f} s", flush=True)
+            records.append(record)
+    return sorted(records, key=lambda record: record["case"])
+
+
+def run_case_in_process(input_file, seed, profiler=None, progress_queue=None):
+    """
+    runs a case in a fresh process of its own, so a worker dying, e.g.
+    killed for running out of memory, only marks its own case as crashed
+    """
+    context = multiprocessing.get_context("spawn")
+    start_time = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(run_case_isolated, input_file, seed, profiler, progress_queue).result()
+    except BrokenProcessPool as error:
+        return {"case": case_name(input_file), "status": "crashed", "seconds": time.time() - start_time, "error": repr(error)}
+
+
+def format_summary(records):
+    """
+    formats the records as a table of wall time and status per case
+    """
+    width = max([len("case")] + [len(record["case"]) for record in records])
+    lines = [f"{'case':<{width}}  {'status':<8}  {'seconds':>10}  error"]
+    lines.append("-" * len(lines[0]))
+    for record in records:
+        lines.append(f"{record['case']:<{width}}  {record['status']:<8}  {record['seconds']:>10.1f}  {record['error']}")
+    return "\n".join(lines)
+
+
+def main():
+    """
+    main function
+    """
+    parser = argparse.ArgumentParser(prog="python -m analysis.sweep", description="Runs every case of a folder in parallel")
+    parser.add_argument("cases_path", help="folder holding one subfolder with a setup.yaml per case")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("-p", "--pattern", default="*", help="glob pattern selecting the case folders")
+    parser.add_argument("-s", "--seed", type=int, default=1, help="base random seed, each case derives its own stream")
+    profiling.add_arguments(parser)
+    reporting.add_arguments(parser)
+    args = parser.parse_args()
+
+    setup_files = discover_cases(args.cases_path, args.pattern)
+    if not setup_files:
+        print("No cases found")
+        sys.exit(1)
+
+    print(f"Running {len(setup_files)} cases on {args.workers} workers", flush=True)
+    # the summed progress of the cases is logged to the console
+    logger = logging.getLogger("analysis.sweep")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler(sys.stdout))
+    records = run_sweep(setup_files, args.workers, args.seed, profiling.from_arguments(args), reporting.from_arguments(args, logger))
+    print(format_summary(records))
+
+    index = build_index(args.cases_path)
+    print(f"Summary of {len(index)} cases indexed at {os.path.join(args.cases_path, INDEX_FILE)}")
+
+    sys.exit(0 if all(record["status"] == "done" for record in records) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,10 @@
-from .generate_dataset_task import GenerateDatasetTask
-from .compare_filters_task import CompareFiltersTask
+from ..lazy import lazy_exports
+
+# exported names and the submodules defining them, imported on first access
+_EXPORTS = {
+    "GenerateDatasetTask": ".generate_dataset_task",
+    "CompareFiltersTask": ".compare_filters_task",
+}
+
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
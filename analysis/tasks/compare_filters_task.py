@@ -19,12 +19,42 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import textwrap
-import csv
 import os
+import textwrap
+from functools import partial
 import numpy as np
-from ..filters import Blue, OF2, MAE, Wiener
+from ..cache import ArrayCache, content_hash
+from ..filters import Blue, OF2, MAE, Wiener, Linear
 from ..generator import PulseShape, PulseGenerator
+from ..instrumentation import iterate, span
+from ..reporting import progress
+from ..statistics import CovarianceAccumulator, ErrorAccumulator
+from ..storage import ResultsStorage, get_dataset_storage
+from ..summary import SUMMARY_FILE, case_summary, write_case_summary
+
+# evaluation settings, which the setup may override
+EVALUATION_DEFAULTS = {
+    "chunk_size": 100000,
+    "histogram_bins": 200,
+    "histogram_range": [-100.0, 100.0],
+    "amplitude_bins": None,
+    "phase_bins": None,
+}
+
+# events per block of noise read for the noise statistics and the Wiener design
+NOISE_CHUNK_SIZE = 100000
+
+# estimated filters, by key, and the name of their weights file
+LINEAR_FILTERS = {
+    "BLUE": "blue",
+    "BLUECOV": "bluecov",
+    "OF2": "of2",
+    "OF2COV": "of2cov",
+    "WHF": "wiener",
+}
+
+# evaluated estimators, by key: the linear filters and the MAE
+ESTIMATORS = list(LINEAR_FILTERS) + ["MAE"]
 
 
 class CompareFiltersTask():
@@ -35,68 +65,156 @@ class CompareFiltersTask():
         self.output_path = output_path
         self.logging = logging
         self.pulse_shape = None
-        self.pulse_generator = None
-        self.train_dataset = None
-        self.test_dataset = None
-        self.filters = None
-        self.results_buffer = None
-
-    def perform(self):
-        """ perform """
-
-        self.__read_dataset()
-        self.__setup_pulse_shape()
-        self.__setup_pulse_simulator()
-        self.__setup_filters()
-        self.__start_performance_test()
-        self.__build_results()
-
-    def __read_dataset(self):
-        dataset_file = self.output_path + "/dataset.csv"
-        if not os.path.exists(dataset_file):
-            raise "Dataset file does not exist"
-
-        dataset = np.loadtxt(dataset_file)
-        [self.train_dataset, self.test_dataset] = np.split(dataset, 2)
+        self.storage = None
+        self.noise_statistics = None
+        self.test_pulse_generator = None
+        self.pipeline = None
+        self.evaluations = {}
+
+        self.evaluation = {**EVALUATION_DEFAULTS, **yml["setup"].get("evaluation", {})}
+        self.keep_events = yml["setup"].get("results", {}).get("keep_events", False)
+
+    def add_stages(self, pipeline):
+        """
+        adds the comparison stages, which follow the dataset one: the test
+        set, the design and the evaluation of each filter and the results.
+        Each stage only depends on the parameters it reads, so editing a
+        filter setting re-runs that filter alone
+        """
+        self.pipeline = pipeline
+        setup = self.yml["setup"]
+        filters = setup["filters"]
+        pulse_shape = self.__pulse_shape_parameters()
+        evaluation = {
+            "histogram_bins": self.evaluation["histogram_bins"],
+            "histogram_range": self.evaluation["histogram_range"],
+            "amplitude_bins": self.evaluation["amplitude_bins"],
+            "phase_bins": self.evaluation["phase_bins"],
+        }
+
+        pipeline.add("test_set", self.__generate_test_set, {
+            "pulse_shape": pulse_shape,
+            "pulse_generator": setup["pulse_generator"],
+            "pileup_luminosity": setup["dataset_generator"]["pileup_luminosity"],
+            "signal_pileup_ratio": setup["dataset_generator"]["signal_pileup_ratio"],
+            "chunk_size": self.evaluation["chunk_size"],
+        }, depends=("dataset",))
+
+        designs = {
+            "BLUE": (self.__design_blue, {"pulse_shape": pulse_shape}, ()),
+            "BLUECOV": (self.__design_blue, {"pulse_shape": pulse_shape}, ("dataset",)),
+            "OF2": (self.__design_of2, {"pulse_shape": pulse_shape}, ()),
+            "OF2COV": (self.__design_of2, {"pulse_shape": pulse_shape}, ("dataset",)),
+            "WHF": (self.__design_wiener, {"pulse_shape": pulse_shape, "wiener": filters["wiener"]}, ("dataset",)),
+        }
+        for key, (action, parameters, depends) in designs.items():
+            pipeline.add(f"design_{key.lower()}", action, parameters, depends)
+
+        for key in LINEAR_FILTERS:
+            pipeline.add(f"evaluate_{key.lower()}", partial(self.__evaluate, key), evaluation, depends=(f"design_{key.lower()}", "test_set"))
+        pipeline.add("evaluate_mae", partial(self.__evaluate, "MAE"), {"mae": filters["mae"], **evaluation}, depends=("test_set",))
+
+        results_depends = ["test_set"]
+        results_depends += [f"design_{key.lower()}" for key in LINEAR_FILTERS]
+        results_depends += [f"evaluate_{key.lower()}" for key in ESTIMATORS]
+        pipeline.add("results", self.__build_results, {
+            "case": os.path.basename(self.output_path),
+            "setup": setup,
+        }, depends=results_depends, output_files=(
+            ResultsStorage(self.output_path).path,
+            os.path.join(self.output_path, SUMMARY_FILE),
+        ))
+
+    def __pulse_shape_parameters(self):
+        """
+        pulse shape parameters, along with a hash of the shape file
+        """
+        parameters = dict(self.yml["setup"]["pulse_shape"])
+        with open(parameters["path"], "rb") as shape_file:
+            parameters["contents"] = content_hash(shape_file.read())
+        return parameters
+
+    def __get_storage(self):
+        if self.storage is not None:
+            return self.storage
+
+        storage_name = self.yml["setup"]["dataset_generator"].get("storage", "binary")
+        storage = get_dataset_storage(storage_name, self.output_path)
+        if not storage.exists():
+            raise RuntimeError("Dataset file does not exist")
 
         self.logging.info(textwrap.dedent(f"""\
-          Dataset loaded:
-            {dataset_file}\
+          Dataset opened:
+            {storage.path}\
         """))
 
-    def __setup_pulse_shape(self):
-        self.pulse_shape = PulseShape.from_yml(self.yml["setup"]["pulse_shape"])
-        self.logging.info(self.pulse_shape)
-
-    def __setup_pulse_simulator(self):
-        self.pulse_generator = PulseGenerator.from_yml(self.yml["setup"]["pulse_generator"], self.pulse_shape)
-        self.logging.info(self.pulse_generator)
-
-    def __setup_filters(self):
-        self.logging.info("Initializing filters")
-
-        # setup generator to design the Wiener filter
-        wiener_pulse_generator = PulseGenerator.from_yml(self.yml["setup"]["filters"]["wiener"]["pulse_generator"], self.pulse_shape)
-        self.logging.info("Wiener Pulse Generator")
-        self.logging.info(wiener_pulse_generator)
-
-        self.filters = {
-            "BLUE": Blue(),
-            "BLUECOV": Blue(self.train_dataset),
-            "OF2": OF2(),
-            "OF2COV": OF2(self.train_dataset),
-            "MAE": MAE(threshold=self.yml["setup"]["filters"]["mae"]["threshold"]),
-            "WHF": Wiener(self.train_dataset, wiener_pulse_generator)
+        self.storage = storage
+        return storage
+
+    def __n_noise_events(self):
+        """
+        events of the train half of the dataset, the noise of the designs
+        and of the test set
+        """
+        return self.yml["setup"]["dataset_generator"]["n_events"] // 2
+
+    def __iter_noise(self, chunk_size):
+        """
+        yields the train half of the dataset in blocks of chunk_size events,
+        read from the storage one at a time
+        """
+        n_events = self.__n_noise_events()
+        blocks = iterate("dataset_read", self.__get_storage().iter_blocks(chunk_size), events=len)
+        for start, block in zip(range(0, n_events, chunk_size), blocks):
+            yield block[:n_events - start]
+
+    def __get_pulse_shape(self):
+        if self.pulse_shape is None:
+            with span("shape_load"):
+                self.pulse_shape = PulseShape.from_yml(self.yml["setup"]["pulse_shape"])
+            self.logging.info(self.pulse_shape)
+        return self.pulse_shape
+
+    def __get_noise_statistics(self):
+        """
+        the noise covariance is accumulated block by block over the train
+        dataset, once for all the designs needing it
+        """
+        if self.noise_statistics is None:
+            size = len(self.__get_pulse_shape().digital_samples_index)
+            with span("noise_statistics"):
+                self.noise_statistics = CovarianceAccumulator.from_blocks(self.__iter_noise(NOISE_CHUNK_SIZE), size)
+        return self.noise_statistics
+
+    def __generate_test_set(self, inputs, rng):
+        """
+        the test set is defined by its seed alone: every stage reading it
+        draws the same pulses again, chunk by chunk, so it is never stored
+        """
+        return {
+            "seed": rng.integers(0, 2**63, size=4),
+            "n_pulses": np.array(self.__n_noise_events()),
         }
 
-        for key in self.filters:
-            self.logging.info(self.filters[key])
+    def __iter_test_set(self, test_set):
+        """
+        yields the truth amplitudes and phases and the signals of the test
+        set in chunks, each one drawn from its own Generator spawned from
+        the test set seed and summed to the noise of the train dataset
+        """
+        pulse_generator = self.__get_test_pulse_generator()
+        seed = [int(word) for word in test_set["seed"]]
 
-        self.logging.debug("Filters ready")
+        for index, noise in enumerate(self.__iter_noise(self.evaluation["chunk_size"])):
+            pulse_generator.set_rng(np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,))))
+            amplitudes, phases, signals = pulse_generator.generate_batch(len(noise))
+            yield amplitudes, phases, signals + noise
 
+    def __get_test_pulse_generator(self):
+        if self.test_pulse_generator is not None:
+            return self.test_pulse_generator
 
-    def __start_performance_test(self):
-        self.logging.info("Initializing performance test")
+        pulse_generator = PulseGenerator.from_yml(self.yml["setup"]["pulse_generator"], self.__get_pulse_shape())
 
         dataset_params = self.yml["setup"]["dataset_generator"]
         signal_pileup_ratio = dataset_params["signal_pileup_ratio"]
@@ -105,61 +223,177 @@ class CompareFiltersTask():
 
         # setup generator to perform the comparison
         # using exponential distribution
-        self.pulse_generator.set_amplitude_generator(np.random.exponential, (signal_luminosity,))
+        pulse_generator.set_amplitude_generator("exponential", (signal_luminosity,))
+        self.logging.info(pulse_generator)
 
-        buffer = {
-            "amplitude_estimated": {},
-            "signal": np.zeros((len(self.test_dataset), 7)),
-            "amplitude_truth": np.zeros(len(self.test_dataset)),
-            "phase_truth": np.zeros(len(self.test_dataset)),
-        }
-        for key in self.filters:
-            buffer["amplitude_estimated"][key] = []
+        self.test_pulse_generator = pulse_generator
+        return pulse_generator
 
-        for i in range(len(self.test_dataset)):
-            analog_pulse = self.pulse_generator.generate_pulse()
-            digital_samples = analog_pulse.get_digital_samples()
+    def __design_blue(self, inputs, rng):
+        noise, noise_key = self.__design_noise(inputs)
+        return self.__design(Blue(self.__get_pulse_shape(), noise, ArrayCache(namespace="filters"), noise_key))
 
-            amplitude = analog_pulse.amplitude
-            phase = analog_pulse.phase
+    def __design_of2(self, inputs, rng):
+        noise, noise_key = self.__design_noise(inputs)
+        return self.__design(OF2(self.__get_pulse_shape(), noise, ArrayCache(namespace="filters"), noise_key))
 
-            buffer["amplitude_truth"][i] = amplitude
-            buffer["phase_truth"][i] = phase
-
-            signal = digital_samples + self.train_dataset[i, :]
-            buffer["signal"][i] = signal
-
-            for key in self.filters:
-                amplitude_estimated = self.filters[key].apply(signal)
-                buffer["amplitude_estimated"][key].append(amplitude_estimated)
-
-        self.logging.info("Performance test finished")
-        self.results_buffer = buffer
-
-
-    def __build_results(self):
-        self.__write_csv_file("results_filter_weights_blue.csv", self.filters["BLUE"].weights)
-        self.__write_csv_file("results_filter_weights_bluecov.csv", self.filters["BLUECOV"].weights)
-        self.__write_csv_file("results_filter_weights_of2.csv", self.filters["OF2"].weights)
-        self.__write_csv_file("results_filter_weights_of2cov.csv", self.filters["OF2COV"].weights)
-        self.__write_csv_file("results_filter_weights_wiener.csv", self.filters["WHF"].weights)
-        self.__write_csv_file("results_amplitude_truth.csv", self.results_buffer["amplitude_truth"])
-        self.__write_csv_file("results_phase_truth.csv", self.results_buffer["phase_truth"])
-        self.__write_csv_file("results_signals.csv", self.results_buffer["signal"])
-        for key in self.filters:
-            self.__write_csv_file(f"results_amplitude_estimated_{key.lower()}.csv", self.results_buffer["amplitude_estimated"][key])
-
-
-    def __write_csv_file(self, filename, data):
-        output_file = f"{self.output_path}/{filename}"
-        with open(output_file, mode='w') as outcsv:
-            writer = csv.writer(outcsv)
-            for value in data:
-                row = np.asarray(value) if type(value) is np.ndarray else [value]
-                writer.writerow(row)
+    def __design_wiener(self, inputs, rng):
+        # setup generator to design the Wiener filter
+        wiener_pulse_generator = PulseGenerator.from_yml(self.yml["setup"]["filters"]["wiener"]["pulse_generator"], self.__get_pulse_shape(), rng)
+        self.logging.info("Wiener Pulse Generator")
+        self.logging.info(wiener_pulse_generator)
 
+        return self.__design(Wiener(self.__iter_noise(NOISE_CHUNK_SIZE), wiener_pulse_generator))
+
+    def __design(self, designed_filter):
+        self.logging.info(designed_filter)
+        return {"weights": designed_filter.weights}
+
+    def __design_noise(self, inputs):
+        """
+        noise of the design, when it depends on the dataset, and the key
+        naming it, the dataset key. The noise is given as the function
+        accumulating its statistics, only called when the design is not
+        cached yet
+        """
+        if "dataset" not in inputs:
+            return None, None
+        return self.__get_noise_statistics, str(inputs["dataset"]["key"])
+
+    def __estimators(self, keys):
+        """
+        estimators of the given keys: the linear filters, from their
+        designs, and the MAE
+        """
+        size = len(self.__get_pulse_shape().digital_samples_index)
+        estimators = {}
+        for key in keys:
+            if key == "MAE":
+                estimators[key] = MAE(threshold=self.yml["setup"]["filters"]["mae"]["threshold"])
+                self.logging.info(estimators[key])
+            else:
+                estimators[key] = Linear(self.pipeline.outputs(f"design_{key.lower()}")["weights"], size)
+        return estimators
+
+    def __iter_estimates(self, test_set, estimators):
+        """
+        yields the chunks of the test set along with the estimates of each
+        estimator over them, so the test set is drawn once for all of them
+        """
+        for amplitudes, phases, signals in iterate("test_set", self.__iter_test_set(test_set), events=lambda chunk: len(chunk[0])):
+            estimates = {}
+            for key, estimator in estimators.items():
+                with span(f"estimation_{key.lower()}", events=len(signals)):
+                    estimates[key] = estimator.apply_batch(signals)
+            yield amplitudes, phases, signals, estimates
+
+    @staticmethod
+    def __estimated_amplitudes(estimator, estimated):
+        """
+        amplitudes out of the estimates, the centered sample for filters
+        estimating a whole window
+        """
+        return estimated[:, estimator.centered_sample] if estimated.ndim > 1 else estimated
+
+    def __evaluate(self, key, inputs, rng):
+        """
+        errors of the estimator over the test set. The evaluations out of
+        date are all computed along the first one run, so the test set is
+        drawn once however many filters changed
+        """
+        if key not in self.evaluations:
+            pending = [other for other in ESTIMATORS if other == key or not self.pipeline.is_up_to_date(f"evaluate_{other.lower()}")]
+            self.evaluations.update(self.__evaluate_estimators(pending, inputs["test_set"]))
+        return self.evaluations.pop(key)
+
+    def __evaluate_estimators(self, keys, test_set):
+        """
+        estimates the test set chunk by chunk with the estimators of the
+        given keys, accumulating the errors of their estimated amplitudes
+        """
+        estimators = self.__estimators(keys)
+        errors = {key: ErrorAccumulator(
+            self.evaluation["histogram_bins"],
+            self.evaluation["histogram_range"],
+            self.evaluation["amplitude_bins"],
+            self.evaluation["phase_bins"],
+        ) for key in estimators}
+        with progress(f"Evaluating {', '.join(key.lower() for key in keys)}", int(test_set["n_pulses"]), unit="pulses") as evaluation:
+            for amplitudes, phases, signals, estimates in self.__iter_estimates(test_set, estimators):
+                for key, estimated in estimates.items():
+                    errors[key].update(self.__estimated_amplitudes(estimators[key], estimated) - amplitudes, amplitudes, phases)
+                evaluation.advance(len(signals))
+
+        return {key: {f"errors_{name}": value for name, value in accumulator.state().items()} for key, accumulator in errors.items()}
+
+    def __build_results(self, inputs, rng):
+        columns = {}
+        summaries = {}
+        for key, name in LINEAR_FILTERS.items():
+            columns[f"filter_weights/{name}"] = inputs[f"design_{key.lower()}"]["weights"]
+
+        for key in ESTIMATORS:
+            evaluation = inputs[f"evaluate_{key.lower()}"]
+            errors = ErrorAccumulator.from_state({name[len("errors_"):]: value for name, value in evaluation.items() if name.startswith("errors_")})
+            summaries[key.lower()] = errors.summary()
+
+            columns[f"error_histogram/{key.lower()}"] = errors.histogram
+            columns[f"error_histogram_edges/{key.lower()}"] = errors.histogram_edges
+            for name in errors.binned:
+                binned = errors.binned_summary(name)
+                columns[f"error_by_{name}/{key.lower()}"] = np.array([binned["count"], binned["mean"], binned["rms"]])
+                columns[f"error_by_{name}_edges/{key.lower()}"] = binned["edges"]
+
+        row_columns = {}
+        row_blocks = ()
+        if self.keep_events:
+            row_columns, row_blocks = self.__event_rows(inputs)
+
+        storage = ResultsStorage(self.output_path)
+        with span("write"):
+            storage.write(columns, metadata={"setup": self.yml["setup"], "errors": summaries}, row_columns=row_columns, row_blocks=row_blocks)
+
+        write_case_summary(self.output_path, case_summary(os.path.basename(self.output_path), self.yml["setup"], summaries))
+
+        lines = ["CompareFiltersTask:", "  filter          mean         rms"]
+        lines += [f"  {key:<8}{summary['mean']:>12.4f}{summary['rms']:>12.4f}" for key, summary in summaries.items()]
+        self.logging.info("\n".join(lines))
         self.logging.info(textwrap.dedent(f"""\
           CompareFiltersTask:
             Output file ready!
-            {output_file}\
+            {storage.path}\
         """))
+
+        if self.yml["setup"].get("results", {}).get("export_csv", False):
+            for output_file in storage.export_csv():
+                self.logging.info(textwrap.dedent(f"""\
+                  CompareFiltersTask:
+                    Output file exported!
+                    {output_file}\
+                """))
+
+    def __event_rows(self, inputs):
+        """
+        row columns of the events and their blocks, estimated again while
+        the test set is drawn, so they are streamed to the results file
+        rather than kept in memory
+        """
+        estimators = self.__estimators(ESTIMATORS)
+        n_pulses = int(inputs["test_set"]["n_pulses"])
+        window_size = len(self.__get_pulse_shape().digital_samples_index)
+        row_columns = {
+            "amplitude_truth": ((n_pulses,), np.float64),
+            "phase_truth": ((n_pulses,), np.float64),
+            "signals": ((n_pulses, window_size), np.float64),
+        }
+        for key in LINEAR_FILTERS:
+            row_columns[f"amplitude_estimated/{key.lower()}"] = ((n_pulses,), np.float64)
+        row_columns["amplitude_estimated/mae"] = ((n_pulses, window_size), np.float64)
+
+        row_blocks = ({
+            "amplitude_truth": amplitudes,
+            "phase_truth": phases,
+            "signals": signals,
+            **{f"amplitude_estimated/{key.lower()}": estimated for key, estimated in estimates.items()},
+        } for amplitudes, phases, signals, estimates in self.__iter_estimates(inputs["test_set"], estimators))
+        return row_columns, row_blocks
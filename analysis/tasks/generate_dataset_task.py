@@ -20,21 +20,23 @@ limitations under the License.
 """
 
 import textwrap
-import os
 import numpy as np
 from ..generator import PulseShape, DatasetGenerator, PulseGenerator
+from ..instrumentation import iterate, span
+from ..storage import CsvStorage, DatasetCache, get_dataset_storage
 
 
 class GenerateDatasetTask():
     """ Dataset Generator Task """
 
-    def __init__(self, yml, output_path, logging):
+    def __init__(self, yml, output_path, logging, rng=None, seed=1):
         self.yml = yml
-        self.output_file = output_path + "/dataset.csv"
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.seed = seed
+        self.output_path = output_path
         self.logging = logging
         self.pulse_shape = None
         self.pulse_generator = None
-        self.dataset = None
 
         dataset_params = yml["setup"]["dataset_generator"]
         self.n_events = dataset_params["n_events"]
@@ -43,6 +45,25 @@ class GenerateDatasetTask():
         self.sampling_rate = dataset_params["sampling_rate"]
         self.signal_pileup_ratio = dataset_params["signal_pileup_ratio"]
         self.window_size = dataset_params["window_size"]
+        self.workers = dataset_params.get("workers", 1)
+        self.storage = get_dataset_storage(dataset_params.get("storage", "binary"), output_path)
+        self.export_csv = dataset_params.get("export_csv", False)
+        self.output_file = self.storage.path
+        self.cache = DatasetCache() if dataset_params.get("cache", True) else None
+        self.dataset_key = DatasetCache.dataset_key(yml["setup"], seed)
+
+    def add_stages(self, pipeline):
+        """
+        adds the dataset stage, fingerprinted by the dataset key. It runs
+        every time, as the dataset keeps its own key and is only generated
+        when out of date, and outputs the key to the stages reading it
+        """
+        pipeline.add("dataset", self.__perform_stage, {"key": self.dataset_key}, always=True)
+
+    def __perform_stage(self, inputs, rng):
+        self.rng = rng
+        self.perform()
+        return {"key": np.array(self.dataset_key)}
 
     def perform(self):
         """ Call dataset generator """
@@ -54,41 +75,100 @@ class GenerateDatasetTask():
             pileup_occupancy = {self.pileup_occupancy}
             sampling_rate = {self.sampling_rate}
             signal_pileup_ratio = {self.signal_pileup_ratio}
-            window_size = {self.window_size}\
+            window_size = {self.window_size}
+            workers = {self.workers}\
         """))
 
-
-        if os.path.exists(self.output_file):
+        refreshed = False
+        if self.__is_up_to_date():
             self.logging.info(textwrap.dedent(f"""\
               GenerateDatasetTasks:
                 Dataset already exists. Skipping!
                 {self.output_file}\
             """))
-            return
+        elif self.cache is not None and self.cache.fetch(self.dataset_key, self.output_file):
+            refreshed = True
+            self.storage.write_metadata(self.__metadata())
+            self.logging.info(textwrap.dedent(f"""\
+              GenerateDatasetTasks:
+                Dataset cache hit!
+                key = {self.dataset_key}
+                {self.output_file}\
+            """))
+        else:
+            refreshed = True
+            if self.cache is not None:
+                self.logging.info(textwrap.dedent(f"""\
+                  GenerateDatasetTasks:
+                    Dataset cache miss
+                    key = {self.dataset_key}\
+                """))
+
+            with span("shape_load"):
+                self.__setup_pulse_shape()
+            with span("generator_setup"):
+                self.__setup_pulse_generator()
+            self.__generate_dataset()
+            if self.cache is not None and not self.cache.store(self.dataset_key, self.output_file, metadata={"setup": self.yml["setup"], "seed": self.seed}):
+                self.logging.warning(textwrap.dedent(f"""\
+                  GenerateDatasetTasks:
+                    Dataset cache store failed
+                    key = {self.dataset_key}\
+                """))
 
-        self.__setup_pulse_shape()
-        self.__setup_pulse_generator()
-        self.__generate_dataset()
-        self.__write_dataset_to_file()
+            self.logging.info(textwrap.dedent(f"""\
+              GenerateDatasetTasks:
+                Dataset ready!
+                {self.output_file}\
+            """))
 
-        self.logging.info(textwrap.dedent(f"""\
-          GenerateDatasetTasks:
-            Dataset ready!
-            {self.output_file}\
-        """))
+        if self.export_csv:
+            with span("export_csv"):
+                self.__export_csv(refreshed)
+
+    def __is_up_to_date(self):
+        """
+        whether the case folder already holds the dataset of this setup
+        """
+        if not self.storage.exists():
+            return False
+
+        metadata = self.storage.read_metadata()
+        return metadata is not None and metadata.get("key") == self.dataset_key
 
     def __setup_pulse_shape(self):
         self.pulse_shape = PulseShape.from_yml(self.yml["setup"]["pulse_shape"])
         self.logging.info(self.pulse_shape)
 
     def __setup_pulse_generator(self):
-        self.pulse_generator = PulseGenerator.from_yml(self.yml["setup"]["pulse_generator"], self.pulse_shape)
-        self.pulse_generator.set_amplitude_generator(np.random.exponential, (self.pileup_luminosity,))
+        self.pulse_generator = PulseGenerator.from_yml(self.yml["setup"]["pulse_generator"], self.pulse_shape, self.rng)
+        self.pulse_generator.set_amplitude_generator("exponential", (self.pileup_luminosity,))
         self.logging.info(self.pulse_generator)
 
     def __generate_dataset(self):
-        dataset_generator = DatasetGenerator(self.pulse_generator)
-        self.dataset, _ = dataset_generator.generate_windowed_samples(self.window_size, self.sampling_rate, self.n_events, self.pileup_occupancy)
+        """
+        generates the dataset block by block, writing each one as it is produced
+        """
+        dataset_generator = DatasetGenerator(self.pulse_generator, workers=self.workers)
+        # seeded by the key, so equal setups give equal datasets in any case folder
+        seed = np.random.SeedSequence(int(self.dataset_key, 16))
+        blocks = dataset_generator.iter_windowed_samples(self.window_size, self.sampling_rate, self.n_events, self.pileup_occupancy, seed=seed)
+        windowed_samples = iterate("generation", (samples for samples, _ in blocks), events=len)
+        with span("write", events=self.n_events):
+            self.storage.write(windowed_samples, self.n_events, self.window_size, metadata=self.__metadata())
+
+    def __metadata(self):
+        """ metadata stored with the dataset, whose key tells whether it is up to date """
+        return {"key": self.dataset_key, "setup": self.yml["setup"]}
+
+    def __export_csv(self, refreshed):
+        csv_storage = CsvStorage(self.output_path)
+        if csv_storage.path == self.storage.path or (csv_storage.exists() and not refreshed):
+            return
 
-    def __write_dataset_to_file(self):
-        np.savetxt(self.output_file, self.dataset, delimiter=" ", fmt="%.5f")
+        csv_storage.write(self.storage.iter_blocks(100000), self.n_events, self.window_size)
+        self.logging.info(textwrap.dedent(f"""\
+          GenerateDatasetTasks:
+            Dataset exported!
+            {csv_storage.path}\
+        """))
@@ -0,0 +1,96 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import numpy as np
+from .runner import compare, format_comparisons, run_benchmarks
+from .suite import benchmark_names
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+
+
+def read_baseline(path):
+    """ reads the baseline results, empty when there is none """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as stream:
+        return json.load(stream)
+
+
+def write_baseline(path, results):
+    """ writes the results as the new baseline, along with the machine they ran on """
+    baseline = {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "results": results,
+    }
+    with open(path, "w") as stream:
+        json.dump(baseline, stream, indent=2)
+
+
+def main():
+    """
+    main function
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks the generator, filter and storage hot paths")
+    parser.add_argument("-k", "--pattern", default=None, help="runs the benchmarks whose name contains the pattern")
+    parser.add_argument("-n", "--events", type=int, nargs="+", default=[10000], help="event counts each benchmark runs with")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per case, the best one is kept")
+    parser.add_argument("-b", "--baseline", default=DEFAULT_BASELINE, help="baseline file the results are compared with")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2, help="relative change flagged as a regression")
+    parser.add_argument("-o", "--output", default=None, help="file the results are written to")
+    parser.add_argument("--save-baseline", action="store_true", help="writes the results as the new baseline")
+    parser.add_argument("--list", action="store_true", help="lists the benchmarks and exits")
+    args = parser.parse_args()
+
+    names = benchmark_names(args.pattern)
+    if args.list:
+        print("\n".join(names))
+        sys.exit(0)
+    if not names:
+        print("No benchmarks found")
+        sys.exit(1)
+
+    results = run_benchmarks(names, args.events, args.repeat)
+    comparisons = compare(results, read_baseline(args.baseline), args.tolerance)
+    print(format_comparisons(comparisons))
+
+    if args.output:
+        write_baseline(args.output, results)
+    if args.save_baseline:
+        write_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    sys.exit(1 if any(comparison["regressions"] for comparison in comparisons) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import multiprocessing
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from .suite import BENCHMARKS, prepare
+
+
+def case_key(result):
+    """ key identifying a benchmark case within the baselines """
+    return f"{result['name']}[n_events={result['n_events']},occupancy={result['occupancy']}]"
+
+
+def measure(name, n_events, occupancy, repeat=3):
+    """
+    times the best of repeat runs of a benchmark, along with the peak
+    memory allocated by one more run, traced apart so tracing does not
+    slow the timed ones and the setup is not counted
+    """
+    run, events, teardown = prepare(name, n_events, occupancy)
+    try:
+        seconds = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start_time)
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        if teardown is not None:
+            teardown()
+
+    return {
+        "name": name,
+        "n_events": n_events,
+        "occupancy": occupancy,
+        "seconds": min(seconds),
+        "events_per_second": events / min(seconds),
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def run_benchmarks(names, event_counts, repeat=3, report=print):
+    """
+    runs every case of the named benchmarks, each one in a fresh process
+    so no case inherits the state left by the previous ones
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in names:
+        for n_events in event_counts:
+            for occupancy in BENCHMARKS[name][1]:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(measure, name, n_events, occupancy, repeat).result()
+                report(f"{case_key(result)}: {result['events_per_second']:.0f} events/s, {result['peak_memory_mb']:.1f} MB")
+                results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    compares the results with the baseline ones, flagging as regressions
+    the cases whose throughput dropped, or whose peak memory grew, by more
+    than the tolerance
+    """
+    baseline_results = {case_key(result): result for result in baseline.get("results", [])}
+    comparisons = []
+    for result in results:
+        reference = baseline_results.get(case_key(result))
+        comparison = {"key": case_key(result), "result": result, "reference": reference, "regressions": []}
+        if reference is not None:
+            comparison["speedup"] = result["events_per_second"] / reference["events_per_second"]
+            if comparison["speedup"] < 1 - tolerance:
+                comparison["regressions"].append("throughput")
+            # baselines saved before the memory was traced hold no comparable peak
+            if reference.get("peak_memory_mb"):
+                comparison["memory_ratio"] = result["peak_memory_mb"] / reference["peak_memory_mb"]
+                if comparison["memory_ratio"] > 1 + tolerance:
+                    comparison["regressions"].append("memory")
+        comparisons.append(comparison)
+    return comparisons
+
+
+def format_comparisons(comparisons):
+    """
+    formats the comparisons as a table of throughput and memory per case
+    """
+    width = max([len("benchmark")] + [len(comparison["key"]) for comparison in comparisons])
+    lines = [f"{'benchmark':<{width}}  {'events/s':>12}  {'peak MB':>8}  {'speedup':>8}  {'memory':>8}  flags"]
+    lines.append("-" * len(lines[0]))
+    for comparison in comparisons:
+        result = comparison["result"]
+        speedup = f"{comparison['speedup']:.2f}x" if "speedup" in comparison else "-"
+        memory = f"{comparison['memory_ratio']:.2f}x" if "memory_ratio" in comparison else "-"
+        flags = ", ".join(f"{regression} regression" for regression in comparison["regressions"])
+        lines.append(f"{comparison['key']:<{width}}  {result['events_per_second']:>12.0f}  {result['peak_memory_mb']:>8.1f}  {speedup:>8}  {memory:>8}  {flags}".rstrip())
+    return "\n".join(lines)
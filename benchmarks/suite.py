@@ -0,0 +1,199 @@
+"""
+            MASTERS ANALYSIS
+
+Bernardo S. Peralva    <bernardo@iprj.uerj.br>
+Guilherme I. Goncalves <ggoncalves@iprj.uerj.br>
+
+Copyright (C) 2021 Bernardo & Guilherme
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+  http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import tempfile
+import numpy as np
+from analysis.filters import Blue, OF2, MAE, Wiener
+from analysis.generator import PulseShape, PulseGenerator, DatasetGenerator
+from analysis.storage import BinaryStorage, CsvStorage
+
+SHAPE_PATH = "shared/unipolar-pulse-shape.dat"
+DIGITAL_SAMPLES_TIME = [-75.5, -50.0, -25.0, 0.0, 25.0, 50.0, 75.0]
+
+# benchmark functions by name, each one prepares its inputs and returns
+# the function to be timed along with the number of events it processes
+# and, when it leaves files behind, the function removing them
+BENCHMARKS = {}
+
+
+def benchmark(name, occupancies=(0.0,)):
+    """ registers a benchmark, run for every event count and occupancy """
+    def register(function):
+        BENCHMARKS[name] = (function, tuple(occupancies))
+        return function
+    return register
+
+
+def pulse_generator(seed=0):
+    """ pulse generator of the moderate occupancy case """
+    pulse_shape = PulseShape(SHAPE_PATH, DIGITAL_SAMPLES_TIME)
+    generator = PulseGenerator(pulse_shape, np.random.default_rng(seed))
+    generator.set_deformation_level(0.01)
+    generator.set_noise_params(0, 1.5)
+    generator.set_phase_generator("random_integers", (-4, 4))
+    generator.set_amplitude_generator("exponential", (30.0,))
+    return generator
+
+
+def noise_dataset(n_events, occupancy=0.5, seed=0):
+    """ pile-up dataset of n_events windows """
+    generator = pulse_generator(seed)
+    samples, _ = DatasetGenerator(generator).generate_windowed_samples(7, 25.0, n_events, occupancy)
+    return samples
+
+
+@benchmark("dataset_generator.generate_windowed_samples", occupancies=(0.0, 0.5))
+def generate_windowed_samples(n_events, occupancy):
+    """ windowed dataset generated at the digital samples """
+    dataset_generator = DatasetGenerator(pulse_generator())
+    return lambda: dataset_generator.generate_windowed_samples(7, 25.0, n_events, occupancy), n_events
+
+
+@benchmark("dataset_generator.generate_windowed_samples.fine_grid", occupancies=(0.0, 0.5))
+def generate_windowed_samples_fine_grid(n_events, occupancy):
+    """ windowed dataset generated over the fine grid """
+    dataset_generator = DatasetGenerator(pulse_generator())
+    return lambda: dataset_generator.generate_windowed_samples(7, 25.0, n_events, occupancy, fine_grid=True), n_events
+
+
+@benchmark("pulse_generator.generate_pulse")
+def generate_pulse(n_events, occupancy):
+    """ pulses generated one at a time """
+    generator = pulse_generator()
+
+    def run():
+        for _ in range(n_events):
+            generator.generate_pulse().get_digital_samples()
+    return run, n_events
+
+
+@benchmark("pulse_generator.generate_batch")
+def generate_batch(n_events, occupancy):
+    """ pulses generated as one batch """
+    generator = pulse_generator()
+    return lambda: generator.generate_batch(n_events), n_events
+
+
+def build_filter(name, train_dataset):
+    """ a filter of the comparison, designed over the train dataset """
+    pulse_shape = PulseShape(SHAPE_PATH, DIGITAL_SAMPLES_TIME)
+    builders = {
+        "blue": lambda: Blue(pulse_shape),
+        "bluecov": lambda: Blue(pulse_shape, train_dataset),
+        "of2": lambda: OF2(pulse_shape),
+        "of2cov": lambda: OF2(pulse_shape, train_dataset),
+        "mae": lambda: MAE(threshold=4.5),
+        "wiener": lambda: Wiener(train_dataset, pulse_generator()),
+    }
+    return builders[name]()
+
+
+def register_filter_benchmarks(name):
+    """ registers the apply, apply_batch and design benchmarks of a filter """
+
+    @benchmark(f"filters.{name}.apply", occupancies=(0.5,))
+    def apply(n_events, occupancy):
+        """ filter applied one window at a time """
+        signals = noise_dataset(n_events, occupancy)
+        estimator = build_filter(name, signals)
+
+        def run():
+            for signal in signals:
+                estimator.apply(signal)
+        return run, n_events
+
+    @benchmark(f"filters.{name}.apply_batch", occupancies=(0.5,))
+    def apply_batch(n_events, occupancy):
+        """ filter applied to every window at once """
+        signals = noise_dataset(n_events, occupancy)
+        estimator = build_filter(name, signals)
+        return lambda: estimator.apply_batch(signals), n_events
+
+    if name == "mae":
+        return
+
+    @benchmark(f"filters.{name}.project_filter_weights", occupancies=(0.5,))
+    def project_filter_weights(n_events, occupancy):
+        """ filter weights designed over the dataset """
+        estimator = build_filter(name, noise_dataset(n_events, occupancy))
+        return estimator.project_filter_weights, n_events
+
+
+for filter_name in ("blue", "bluecov", "of2", "of2cov", "mae", "wiener"):
+    register_filter_benchmarks(filter_name)
+
+
+@benchmark("storage.csv.write", occupancies=(0.5,))
+def csv_write(n_events, occupancy):
+    """ dataset written as csv """
+    return storage_write(CsvStorage, n_events, occupancy)
+
+
+@benchmark("storage.csv.read", occupancies=(0.5,))
+def csv_read(n_events, occupancy):
+    """ dataset read from csv """
+    return storage_read(CsvStorage, n_events, occupancy)
+
+
+@benchmark("storage.binary.write", occupancies=(0.5,))
+def binary_write(n_events, occupancy):
+    """ dataset written as binary """
+    return storage_write(BinaryStorage, n_events, occupancy)
+
+
+@benchmark("storage.binary.read", occupancies=(0.5,))
+def binary_read(n_events, occupancy):
+    """ dataset read from the memory-mapped binary file """
+    def read(storage):
+        return np.asarray(storage.read()).sum()
+    return storage_read(BinaryStorage, n_events, occupancy, read)
+
+
+def storage_write(storage_class, n_events, occupancy):
+    """ dataset written by a storage into a temporary folder, removed by the teardown """
+    samples = noise_dataset(n_events, occupancy)
+    directory = tempfile.TemporaryDirectory()
+    storage = storage_class(directory.name)
+    return lambda: storage.write([samples], n_events, 7), n_events, directory.cleanup
+
+
+def storage_read(storage_class, n_events, occupancy, read=None):
+    """ dataset read by a storage from a temporary folder, removed by the teardown """
+    samples = noise_dataset(n_events, occupancy)
+    directory = tempfile.TemporaryDirectory()
+    storage = storage_class(directory.name)
+    storage.write([samples], n_events, 7)
+    read = read or (lambda storage: storage.read())
+    return lambda: read(storage), n_events, directory.cleanup
+
+
+def benchmark_names(pattern=None):
+    """ names of the registered benchmarks containing the pattern """
+    return [name for name in BENCHMARKS if pattern is None or pattern in name]
+
+
+def prepare(name, n_events, occupancy):
+    """ the function to be timed by a benchmark, its number of events and its teardown, if any """
+    if not os.path.exists(SHAPE_PATH):
+        raise RuntimeError("Benchmarks must run from the repository root")
+    prepared = BENCHMARKS[name][0](n_events, occupancy)
+    return prepared if len(prepared) == 3 else (*prepared, None)
@@ -69,13 +69,9 @@ def plot_pulse(pulse, label):
     """
     draw a pulse
     """
-    time_series = list()
-    sample_series = list()
-    for time, sample in pulse:
-        time_series.append(time)
-        sample_series.append(sample)
+    time_series, sample_series = pulse.waveform()
     plot = plt.plot(time_series, sample_series, "-", label=label)
-    plt.plot(pulse.pulse_shape.digital_samples_time, pulse.get_digital_samples(), ".",
+    plt.plot(pulse.pulse_shape.digital_samples_time, pulse.digital_samples(), ".",
              color=plot[0].get_color(),
              markersize=10,
              markeredgewidth=1.5,
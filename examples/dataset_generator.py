@@ -54,11 +54,11 @@ def __setup_pulse_generator(pileup_luminosity):
     shape_path = "shared/unipolar-pulse-shape.dat"
     pulse_shape = PulseShape(shape_path)
     pulse_generator = PulseGenerator(pulse_shape)
-    pulse_generator.set_amplitude_generator(np.random.exponential, (pileup_luminosity,))
+    pulse_generator.set_amplitude_generator("exponential", (pileup_luminosity,))
     pulse_generator.set_deformation_level(0.01)
     pulse_generator.set_noise_params(0, 1.5)
     pulse_generator.set_pedestal(50)
-    pulse_generator.set_phase_generator(np.random.random_integers, (-5, 5))
+    pulse_generator.set_phase_generator("integers", (-5, 6))
     return pulse_generator
 
 
@@ -18,7 +18,6 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import numpy as np
 import matplotlib.pyplot as plt
 from analysis.generator import PulseShape, PulseGenerator, DatasetGenerator
 
@@ -45,7 +44,7 @@ def main():
     pulse_generator.set_noise_params(noise_mean, noise_std)
 
     # setup dataset
-    pulse_generator.set_amplitude_generator(np.random.exponential, (pileup_luminosity,))
+    pulse_generator.set_amplitude_generator("exponential", (pileup_luminosity,))
     dataset_generator = DatasetGenerator(pulse_generator)
     samples, _ = dataset_generator.generate_windowed_samples(window_size, sampling_rate, n_samples, pileup_occupancy)
 
@@ -18,10 +18,10 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import os
 import numpy as np
 import matplotlib.pyplot as plt
 from analysis.filters import MAE
+from analysis.storage import ResultsStorage
 
 
 def main():
@@ -29,23 +29,24 @@ def main():
     main function
     """
 
-    dataset_file = "./cases/plpocc0.0_plplumi30.0_snr3_phase1nsUni_tilecal/results_signals.csv"
-    truth_amplitudes_file = "./cases/plpocc0.0_plplumi30.0_snr3_phase1nsUni_tilecal/results_amplitude_truth.csv"
+    case_path = "./cases/plpocc0.0_plplumi30.0_snr3_phase1nsUni_tilecal"
 
-    dataset          = np.loadtxt(dataset_file, delimiter=',')
-    truth_amplitudes = np.loadtxt(truth_amplitudes_file)
-    mae              = MAE(threshold=4.5)
-    mae_error        = np.zeros(len(dataset))
+    results          = ResultsStorage(case_path).read()
+    if "signals" not in results:
+        raise SystemExit(f"{case_path} keeps no events: set results: {{keep_events: true}} in its setup and run it again")
 
-    for i in range(len(dataset)):
-        signal = dataset[i]
-        truth_amplitude = truth_amplitudes[i]
-        mae_amplitude = mae.apply(signal)[3]
-        mae_error[i] = (mae_amplitude - truth_amplitude) / 12.0
+    dataset          = results["signals"]
+    truth_amplitudes = results["amplitude_truth"]
+    mae              = MAE(threshold=4.5)
+    mae_amplitudes   = mae.apply_batch(dataset)[:, mae.centered_sample]
+    mae_error        = (mae_amplitudes - truth_amplitudes) / 12.0
 
     print(f"Mean = {np.mean(mae_error)}")
     print(f"RSM  = {np.std(mae_error)}")
 
+    # the same metrics, in ADC, accumulated while the case was evaluated
+    print(f"Case errors = {results.metadata['errors']['mae']}")
+
     kwargs = dict(bins=50)
     plt.hist(mae_error, **kwargs)
     plt.title("First Sample of Dataset")
@@ -20,7 +20,6 @@ limitations under the License.
 """
 import matplotlib.pyplot as plt
 import matplotlib.ticker as tck
-import numpy as np
 from analysis.generator import AnalogPulse, PulseShape
 
 
@@ -68,13 +67,9 @@ def plot_pulse(pulse, label, color):
     """
     draw a pulse
     """
-    time_series = list()
-    sample_series = list()
-    for time, sample in pulse:
-        time_series.append(time)
-        sample_series.append(sample)
+    time_series, sample_series = pulse.waveform()
     plot = plt.plot(time_series, sample_series, "-", label=label, color=color)
-    plt.plot(pulse.pulse_shape.digital_samples_time, pulse.get_digital_samples(), ".",
+    plt.plot(pulse.pulse_shape.digital_samples_time, pulse.digital_samples(), ".",
              color=plot[0].get_color(),
              markersize=10)
 
@@ -82,13 +77,12 @@ def plot_sum_of_pulses(pulse_a, pulse_b, label, color):
     """
     draw a pulse
     """
-    time_series = [time for time,_ in pulse_a]
-    samples_a = np.array([sample for _, sample in pulse_a])
-    samples_b = np.array([sample for _, sample in pulse_b])
-    pulses_sum = samples_a + samples_b 
+    time_series, samples_a = pulse_a.waveform()
+    _, samples_b = pulse_b.waveform()
+    pulses_sum = samples_a + samples_b
     plt.plot(time_series, pulses_sum, "-", label=label, color=color)
 
-    digital_samples = [pulses_sum[time_index] for time_index in pulse_a.pulse_shape.digital_samples_index]
+    digital_samples = pulses_sum[pulse_a.pulse_shape.digital_samples_index]
     plt.plot(pulse_a.pulse_shape.digital_samples_time, digital_samples, ".",
              color=color,
              markersize=10)
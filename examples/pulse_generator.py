@@ -18,7 +18,6 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import numpy as np
 import matplotlib.pyplot as plt
 from analysis.generator import PulseGenerator, PulseShape
 
@@ -32,20 +31,16 @@ def main():
     pulse_shape = PulseShape(shape_path)
 
     pulse_generator = PulseGenerator(pulse_shape)
-    pulse_generator.set_amplitude_generator(np.random.random_integers, (0, 800))
+    pulse_generator.set_amplitude_generator("integers", (0, 801))
     pulse_generator.set_deformation_level(0.01)
     pulse_generator.set_noise_params(0, 1.5)
     pulse_generator.set_pedestal(40)
-    pulse_generator.set_phase_generator(np.random.random_integers, (-5, 5))
+    pulse_generator.set_phase_generator("integers", (-5, 6))
 
     analog_pulse = pulse_generator.generate_pulse(pedestal=20)
     print(analog_pulse)
 
-    time_series = list()
-    sample_series = list()
-    for time, sample in analog_pulse:
-        time_series.append(time)
-        sample_series.append(sample)
+    time_series, sample_series = analog_pulse.waveform()
 
     plt.grid(zorder=0, linestyle="--")
     plt.plot(time_series, sample_series, ".", label="pulse")